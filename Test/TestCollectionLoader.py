@@ -1,11 +1,15 @@
+import gzip
+import itertools
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 import numpy as np
 import pandas as pd
 
 from Utils.config import RESOURCES_PATH
-from src.Utils.CollectionLoader import CollectionLoader
+from src.Utils.CollectionLoader import CollectionLoader, DOCS_COUNT_SUFFIX
 
 
 class TestCollectionLoader(unittest.TestCase):
@@ -25,6 +29,26 @@ class TestCollectionLoader(unittest.TestCase):
         self.assertGreater(total_docs, 0)
         print(f"Total documents in collection: {total_docs}")
 
+    def test_get_total_docs_cached(self):
+        """Test that the documents count is cached next to the collection and read back."""
+        with tempfile.TemporaryDirectory() as directory:
+            collection_path = os.path.join(directory, "collection.tar.gz")
+            with gzip.open(collection_path, 'wt', encoding='utf-8') as f:
+                f.write("header\n1\tfirst document\n2\tsecond document")
+
+            self.assertEqual(CollectionLoader(file_path=collection_path).get_total_docs(), 2)
+            self.assertTrue(os.path.exists(collection_path + DOCS_COUNT_SUFFIX))
+            with open(collection_path + DOCS_COUNT_SUFFIX) as f:
+                signature = f.read().split(' ', 1)[1]
+            with open(collection_path + DOCS_COUNT_SUFFIX, 'w') as f:
+                f.write(f"5 {signature}")
+            self.assertEqual(CollectionLoader(file_path=collection_path).get_total_docs(), 5)
+
+            # A count taken on another version of the collection is not used
+            with gzip.open(collection_path, 'wt', encoding='utf-8') as f:
+                f.write("header\n1\tfirst document\n")
+            self.assertEqual(CollectionLoader(file_path=collection_path).get_total_docs(), 1)
+
     def test_process_chunks_iterator(self):
         """Test if chunk processing works correctly"""
         # Process first few chunks
@@ -90,6 +114,21 @@ class TestCollectionLoader(unittest.TestCase):
         print("Sample data:")
         print(sampled_df.head())
 
+    def test_sample_lines_zero_random(self):
+        """Test that sampling does not fail when the random generator returns 0."""
+        with tempfile.TemporaryDirectory() as directory:
+            collection_path = os.path.join(directory, "collection.tar.gz")
+            with gzip.open(collection_path, 'wt', encoding='utf-8') as f:
+                f.write("header\n" + "".join(f"{i}\tdocument {i}\n" for i in range(1, 101)))
+
+            # Every other draw is 0, the rest are 0.5
+            draws = itertools.cycle([0.0, 0.5])
+            with mock.patch('random.random', side_effect=lambda: next(draws)):
+                sampled_df = CollectionLoader(file_path=collection_path).sample_lines(num_lines=5)
+
+        self.assertEqual(len(sampled_df), 5)
+        self.assertTrue(sampled_df['index'].between(1, 100).all())
+
     def test_malformed_data_handling(self):
         """Test handling of chunks with different column counts."""
         # Process a few chunks to check for errors
@@ -111,6 +150,14 @@ class TestCollectionLoader(unittest.TestCase):
         chunk = next(self.loader.process_chunks(chunk_size=custom_chunk_size))
         self.assertLessEqual(len(chunk), custom_chunk_size)
 
+    def test_process_chunks_single_pass(self):
+        """Test that streaming the chunks yields the same documents as reading them one at a time."""
+        chunks = self.loader.process_chunks(chunk_size=200)
+        for start in (0, 200):
+            streamed_chunk = next(chunks)
+            single_chunk = self.loader.process_single_chunk(start, 200)
+            self.assertEqual(streamed_chunk['index'].tolist(), single_chunk['index'].tolist())
+
 
 if __name__ == '__main__':
     unittest.main()
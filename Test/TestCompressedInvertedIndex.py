@@ -68,6 +68,41 @@ class TestCompressedInvertedIndex(unittest.TestCase):
         self.assertEqual(postings[2].doc_id, 3)
         self.assertEqual(postings[2].payload, 15)
 
+    def test_load_compressed_index_mapped(self):
+        """Test opening a compressed index file as a memory map."""
+        self.index.compress_and_add_postings("example", [4, 5, 6], [20, 25, 30])
+        self.index.write_compressed_index_to_file(self.compressed_file)
+
+        mapped_index = CompressedInvertedIndex.load_compressed_index_mapped(self.compressed_file)
+        self.assertEqual(list(mapped_index.get_terms()), ["test", "example"])
+        for term in ("test", "example"):
+            self.assertEqual(mapped_index.get_compressed_postings(term), self.index.get_compressed_postings(term))
+        self.assertEqual(mapped_index.get_compressed_postings("missing"), b'')
+        self.assertEqual([posting.doc_id for posting in mapped_index.get_uncompressed_postings("example")], [4, 5, 6])
+
+        # The memory-mapped index is read-only
+        with self.assertRaises(ValueError):
+            mapped_index.add_compressed_postings("test", self.index.get_compressed_postings("test"))
+
+        # Closing releases the memory map
+        mapped_index.close()
+        self.assertEqual(list(mapped_index.get_terms()), [])
+        mapped_index.close()
+
+    def test_load_compressed_index_mapped_truncated(self):
+        """Test that a file cut off inside an entry header is rejected."""
+        self.index.write_compressed_index_to_file(self.compressed_file)
+        with open(self.compressed_file, 'rb') as f:
+            data = f.read()
+
+        # Cut inside the term length, then inside the compressed data length
+        for truncated in (data + b'\x01', data[:len(data) - len(self.index.get_compressed_postings("test")) - 2]):
+            with self.subTest(size=len(truncated)):
+                with open(self.compressed_file, 'wb') as f:
+                    f.write(truncated)
+                with self.assertRaises(ValueError):
+                    CompressedInvertedIndex.load_compressed_index_mapped(self.compressed_file)
+
     def test_compress_and_add_postings(self):
         """Test compressing and adding postings to the index."""
         term = "example"
@@ -91,6 +126,17 @@ class TestCompressedInvertedIndex(unittest.TestCase):
         self.assertEqual(postings[2].doc_id, 6)
         self.assertEqual(postings[2].payload, 30)
 
+    def test_get_posting_list(self):
+        """Test the cursor over the postings of a term, and that decoded postings are cached."""
+        posting_list = self.index.get_posting_list(self.term)
+        self.assertEqual(posting_list.doc_ids.tolist(), self.doc_ids)
+        self.assertEqual(posting_list.frequencies.tolist(), self.frequencies)
+        self.assertEqual(posting_list.next_geq(2).payload, 10)
+
+        # A second cursor shares the decoded arrays of the first one
+        self.assertIs(self.index.get_posting_list(self.term).doc_ids, posting_list.doc_ids)
+        self.assertEqual(len(self.index.get_posting_list("missing")), 0)
+
     def test_get_terms(self):
         """Test fetching all terms from the compressed inverted index."""
         term = "example"
@@ -1,6 +1,6 @@
 import unittest
 
-from src.Utils.CompressionTools import CompressionTools
+from src.Utils.CompressionTools import BITSET_FLAG, BLOCKED_CODEC_TAG, CompressionTools
 
 
 class TestCompressionTools(unittest.TestCase):
@@ -79,6 +79,72 @@ class TestCompressionTools(unittest.TestCase):
         self.assertEqual(doc_ids, decompressed_doc_ids)
         self.assertEqual(frequencies, decompressed_frequencies)
 
+    def test_decompress_arrays(self):
+        """Test that the array decompression matches the list one, for every byte width."""
+        for max_doc_id in (200, 60000, 10 ** 7, 2 ** 36):
+            with self.subTest(max_doc_id=max_doc_id):
+                doc_ids = [1, 5, max_doc_id]
+                frequencies = [3, 1, 2]
+                compressed_data = CompressionTools.p_for_delta_compress(doc_ids, frequencies)
+
+                decompressed_doc_ids, decompressed_frequencies = \
+                    CompressionTools.p_for_delta_decompress_arrays(compressed_data)
+
+                self.assertEqual(decompressed_doc_ids.tolist(), doc_ids)
+                self.assertEqual(decompressed_frequencies.tolist(), frequencies)
+
+    def test_decompress_many(self):
+        """Test that several blocks are decompressed into the concatenation of their postings."""
+        blocks = [
+            CompressionTools.p_for_delta_compress([1, 5, 9], [3, 1, 2]),
+            b"",
+            CompressionTools.p_for_delta_compress([2, 70000], [4, 300]),
+        ]
+
+        doc_ids, frequencies = CompressionTools.p_for_delta_decompress_many(blocks)
+
+        self.assertEqual(doc_ids.tolist(), [1, 5, 9, 2, 70000])
+        self.assertEqual(frequencies.tolist(), [3, 1, 2, 4, 300])
+
+    def test_blocked_compress_decompress(self):
+        """Test bit-packed blocks with a varint tail, for several bit widths."""
+        for max_delta in (1, 7, 300, 70000, 2 ** 40):
+            with self.subTest(max_delta=max_delta):
+                doc_ids = [i * max_delta + 1 for i in range(300)]
+                frequencies = [i % 17 for i in range(300)]
+
+                compressed_data = CompressionTools.p_for_delta_compress(doc_ids, frequencies)
+                decompressed_doc_ids, decompressed_frequencies = \
+                    CompressionTools.p_for_delta_decompress(compressed_data)
+
+                self.assertEqual(compressed_data[0], BLOCKED_CODEC_TAG)
+                self.assertEqual(CompressionTools.p_for_delta_count(compressed_data), len(doc_ids))
+                self.assertEqual(doc_ids, decompressed_doc_ids)
+                self.assertEqual(frequencies, decompressed_frequencies)
+
+    def test_bitset_compress_decompress(self):
+        """Test that dense blocks of doc_ids are stored as bitsets and decompressed correctly."""
+        doc_ids = [i for i in range(5, 1000) if i % 3 != 0]
+        frequencies = [i % 5 + 1 for i in range(len(doc_ids))]
+
+        compressed_data = CompressionTools.p_for_delta_compress(doc_ids, frequencies)
+        decompressed_doc_ids, decompressed_frequencies = CompressionTools.p_for_delta_decompress(compressed_data)
+
+        # The width of the first doc_id block follows the 5 header bytes
+        self.assertTrue(compressed_data[5] & BITSET_FLAG)
+        self.assertEqual(doc_ids, decompressed_doc_ids)
+        self.assertEqual(frequencies, decompressed_frequencies)
+
+    def test_legacy_decompress(self):
+        """Test that postings written with the fixed-width encoding can still be decompressed."""
+        # Width of 2 bytes, deltas 1, 299 and frequencies 3, 1000
+        legacy_data = bytes([2, 0, 1, 1, 43, 0, 3, 3, 232])
+
+        decompressed_doc_ids, decompressed_frequencies = CompressionTools.p_for_delta_decompress(legacy_data)
+
+        self.assertEqual(decompressed_doc_ids, [1, 300])
+        self.assertEqual(decompressed_frequencies, [3, 1000])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -19,6 +19,11 @@ class TestDocumentTable(unittest.TestCase):
         self.assertIn(1, doc_data)
         self.assertEqual(doc_data[1], 100)
 
+    def test_add_documents_bulk(self):
+        """Test adding several documents with a single call."""
+        self.document_table.add_documents_bulk([1, 2, 3], [10, 20, 30])
+        self.assertEqual(self.document_table.get_all_documents(), {1: 10, 2: 20, 3: 30})
+
     def test_get_document_length(self):
         """Test retrieving the length of a document."""
         self.document_table.add_document(2, 200)
@@ -1,7 +1,10 @@
 import os
 import unittest
 
+import numpy as np
+
 from Index.InvertedIndex.InvertedIndex import InvertedIndex
+from Index.InvertedIndex.Posting import Posting
 
 
 class TestInvertedIndex(unittest.TestCase):
@@ -33,6 +36,35 @@ class TestInvertedIndex(unittest.TestCase):
         self.assertEqual(postings[1].doc_id, 2)
         self.assertEqual(postings[1].payload, 10)
 
+    def test_add_postings(self):
+        """Test appending a whole list of postings to a term."""
+        self.index.add_postings("test", [Posting(4, 1), Posting(7, 2)])
+        postings = self.index.get_postings("test")
+        self.assertEqual([(p.doc_id, p.payload) for p in postings], [(1, 5), (2, 10), (4, 1), (7, 2)])
+
+    def test_add_postings_bulk(self):
+        """Test adding a document to several posting lists with a single call."""
+        self.index.add_postings_bulk(["test", "new"], 4, [3, 1])
+        self.assertEqual([(p.doc_id, p.payload) for p in self.index.get_postings("test")], [(1, 5), (2, 10), (4, 3)])
+        self.assertEqual([(p.doc_id, p.payload) for p in self.index.get_postings("new")], [(4, 1)])
+
+    def test_add_posting_arrays(self):
+        """Test appending NumPy arrays of postings, with frequencies clipped to 16 bits."""
+        self.index.add_posting_arrays("array", np.array([3, 8]), np.array([2, 70000]))
+        doc_ids, frequencies = self.index.get_posting_arrays("array")
+        self.assertEqual(list(doc_ids), [3, 8])
+        self.assertEqual(list(frequencies), [2, 65535])
+
+    def test_merge(self):
+        """Test appending the postings of an index covering the following documents."""
+        other = InvertedIndex()
+        other.add_posting("test", 7, 1)
+        other.add_posting("new", 8, 2)
+
+        self.index.merge(other)
+        self.assertEqual([(p.doc_id, p.payload) for p in self.index.get_postings("test")], [(1, 5), (2, 10), (7, 1)])
+        self.assertEqual([(p.doc_id, p.payload) for p in self.index.get_postings("new")], [(8, 2)])
+
     def test_compression_and_decompression(self):
         """Test writing and loading a compressed index."""
         # Write the index to a compressed file
@@ -1,6 +1,12 @@
+import filecmp
+import gzip
 import os
+import tempfile
 import time
 import unittest
+from unittest import mock
+
+import pandas as pd
 
 from Index.DocumentTable.DocumentTable import DocumentTable
 from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex
@@ -53,6 +59,75 @@ class TestInvertedIndexBuilder(unittest.TestCase):
             os.remove(partial_lexicon_table_path)
             print(f"Deleted partial lexicon file: {partial_lexicon_table_path}")
 
+    def _build_full_index(self, directory: str, **builder_options) -> InvertedIndexBuilder:
+        """Build a full index of a small collection in a directory, in chunks of 3 documents."""
+        texts = ["Dogs running in the park", "The park closes early", "Cats sleep all day",
+                 "Running shoes for the park", "Early birds catch worms", "Dogs and cats play together",
+                 "Shoes left in the park", "Birds sing early in the day", "Worms hide from birds",
+                 "Cats chase birds in the park", "Dogs sleep early", "Play all day in the park",
+                 "Running dogs chase cats", "Birds and worms", "The day closes"]
+        collection_path = os.path.join(directory, "collection.tar.gz")
+        with gzip.open(collection_path, 'wt', encoding='utf-8') as f:
+            f.write("header\n" + "".join(f"{doc_id}\t{text}\n" for doc_id, text in enumerate(texts, 1)))
+
+        builder = InvertedIndexBuilder(
+            collection_loader=CollectionLoader(file_path=collection_path),
+            preprocessing=self.preprocessing,
+            merger=Merger(),
+            document_table=DocumentTable(),
+            lexicon=Lexicon(),
+            **builder_options
+        )
+        builder.resources_path = directory + os.sep
+        builder.build_full_index(use_static_chunk_size=True, static_chunk_size=3)
+        return builder
+
+    def test_build_full_index_get_index(self):
+        """Test that the index built in full is available through get_index."""
+        with tempfile.TemporaryDirectory() as directory:
+            builder = self._build_full_index(directory)
+            index = builder.get_index()
+            saved_index = CompressedInvertedIndex.load_compressed_index_to_memory(
+                os.path.join(directory, "InvertedIndex"))
+
+            self.assertGreater(len(list(index.get_terms())), 0)
+            self.assertEqual(list(index.get_terms()), list(saved_index.get_terms()))
+            self.assertEqual(sorted(index.get_terms()), sorted(builder.get_lexicon().get_all_terms()))
+            for term in saved_index.get_terms():
+                self.assertEqual(index.get_compressed_postings(term), saved_index.get_compressed_postings(term))
+            index.close()
+
+    def test_build_full_index_parallel(self):
+        """Test that building the partial indices in worker processes gives the same structures."""
+        with tempfile.TemporaryDirectory() as sequential_directory, \
+                tempfile.TemporaryDirectory() as parallel_directory:
+            self._build_full_index(sequential_directory).get_index().close()
+            self._build_full_index(parallel_directory, max_workers=2).get_index().close()
+
+            for filename in ("InvertedIndex", "Lexicon", "DocumentTable"):
+                with self.subTest(filename=filename):
+                    self.assertTrue(filecmp.cmp(os.path.join(sequential_directory, filename),
+                                                os.path.join(parallel_directory, filename), shallow=False))
+
+    def test_build_full_index_flush_every(self):
+        """Test that buffering several chunks per partial index gives the same index with fewer partial files."""
+        with tempfile.TemporaryDirectory() as unbuffered_directory, \
+                tempfile.TemporaryDirectory() as buffered_directory:
+            partial_indices_counts = []
+            for directory, flush_every in ((unbuffered_directory, 1), (buffered_directory, 2)):
+                # Count the partial indices handed to the merger
+                with mock.patch.object(Merger, 'merge_compressed_index_files', autospec=True,
+                                       side_effect=Merger.merge_compressed_index_files) as merge:
+                    self._build_full_index(directory, flush_every=flush_every).get_index().close()
+                partial_indices_counts.append(len(merge.call_args.args[1]))
+
+            # 15 documents in chunks of 3: the last partial index of the buffered build holds a single chunk
+            self.assertEqual(partial_indices_counts, [5, 3])
+            for filename in ("InvertedIndex", "Lexicon", "DocumentTable"):
+                with self.subTest(filename=filename):
+                    self.assertTrue(filecmp.cmp(os.path.join(unbuffered_directory, filename),
+                                                os.path.join(buffered_directory, filename), shallow=False))
+
     def test_already_built_full_structures(self):
         """Test the structures previously built work as expected."""
 
@@ -230,6 +305,28 @@ class TestInvertedIndexBuilder(unittest.TestCase):
         except Exception as e:
             self.fail(f"Partial index building failed with error: {str(e)}")
 
+    def test_process_chunk_postings_only(self):
+        """Test that processing a chunk for its postings only leaves the builder structures untouched."""
+        chunk = pd.DataFrame({'index': [1, 2], 'text': ["Dogs running in the park", "The park closes early"]})
+        builder = InvertedIndexBuilder(
+            collection_loader=self.collection_loader,
+            preprocessing=self.preprocessing,
+            merger=self.merger,
+            document_table=DocumentTable(),
+            lexicon=Lexicon()
+        )
+
+        postings_index = builder.process_chunk(chunk.copy(), postings_only=True)
+        self.assertEqual(builder._vocab, {})
+        self.assertEqual(builder.get_lexicon().get_all_terms(), [])
+        self.assertEqual(builder.get_document_table().get_all_documents(), {})
+
+        # The postings are the same as the ones of a full processing
+        full_index = builder.process_chunk(chunk.copy())
+        self.assertEqual(sorted(postings_index.get_terms()), sorted(full_index.get_terms()))
+        for term in full_index.get_terms():
+            self.assertEqual(postings_index.get_posting_arrays(term), full_index.get_posting_arrays(term))
+
 
 if __name__ == '__main__':
     unittest.main()
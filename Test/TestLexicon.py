@@ -26,6 +26,25 @@ class TestLexicon(unittest.TestCase):
         self.assertEqual(self.lexicon.get_term_info("banana"), 3)
         self.assertIsNone(self.lexicon.get_term_info("cherry"))  # Non-existent term
 
+    def test_add_terms_bulk(self):
+        """Test adding several terms at once, summing the frequencies of existing terms."""
+        self.lexicon.add_term("apple", 5)
+        self.lexicon.add_terms_bulk(["apple", "banana"], [2, 3])
+
+        self.assertEqual(self.lexicon.get_term_info("apple"), 7)
+        self.assertEqual(self.lexicon.get_term_info("banana"), 3)
+
+    def test_merge(self):
+        """Test merging another lexicon into this one."""
+        self.lexicon.add_term("apple", 5)
+        other = Lexicon.Lexicon()
+        other.add_term("apple", 1)
+        other.add_term("cherry", 4)
+
+        self.lexicon.merge(other)
+        self.assertEqual(self.lexicon.get_term_info("apple"), 6)
+        self.assertEqual(self.lexicon.get_term_info("cherry"), 4)
+
     def test_get_all_terms(self):
         """Test retrieving all terms in the lexicon."""
         self.lexicon.add_term("apple", 5)
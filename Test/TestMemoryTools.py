@@ -13,6 +13,11 @@ class TestMemoryTrackingTools(unittest.TestCase):
         available_memory = self.memory_tool.get_available_memory()
         self.assertGreaterEqual(available_memory, 0, "Available memory should be non-negative.")
 
+    def test_get_available_memory_cached(self):
+        """Test that a recent reading is reused only when the caller accepts it."""
+        available_memory = self.memory_tool.get_available_memory()
+        self.assertEqual(self.memory_tool.get_available_memory(max_age=60), available_memory)
+
     def test_get_total_memory(self):
         """Test if the method returns a non-negative total memory value."""
         total_memory = self.memory_tool.get_total_memory()
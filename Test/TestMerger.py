@@ -104,6 +104,48 @@ class TestMerger(unittest.TestCase):
         self.assertTrue(self.term2 in final_index.get_terms())
         self.assertTrue(term3 in final_index.get_terms())
 
+    def test_merge_multiple_compressed_indices_on_consumed(self):
+        """Test that every index path is reported once it has been consumed by the merger."""
+        index_paths = []
+        for idx, index in enumerate([self.index1, self.index2], start=1):
+            file_name = f"index{idx}"
+            index.write_compressed_index_to_file(file_name)
+            self.test_files.append(file_name)
+            index_paths.append(file_name)
+
+        consumed_paths = []
+        final_index = self.merger.merge_multiple_compressed_indices(index_paths, on_consumed=consumed_paths.append)
+
+        self.assertEqual(consumed_paths, index_paths)
+        self.assertTrue(self.term1 in final_index.get_terms())
+
+    def test_merge_compressed_index_files(self):
+        """Test the streaming merge of index files sorted by term, written straight to disk."""
+        term3 = "cherry"
+        index3 = CompressedInvertedIndex()
+        index3.add_compressed_postings(self.term1, CompressionTools.p_for_delta_compress([7, 9], [1, 1]))
+        index3.add_compressed_postings(term3, CompressionTools.p_for_delta_compress([8], [2]))
+
+        index_paths = []
+        for idx, index in enumerate([self.index1, self.index2, index3], start=1):
+            file_name = f"index{idx}"
+            index.write_compressed_index_to_file(file_name)
+            self.test_files.append(file_name)
+            index_paths.append(file_name)
+        output_path = "merged_index"
+        self.test_files.append(output_path)
+
+        consumed_paths = []
+        num_terms = self.merger.merge_compressed_index_files(index_paths, output_path, consumed_paths.append)
+        final_index = CompressedInvertedIndex.load_compressed_index_to_memory(output_path)
+
+        self.assertEqual(num_terms, 3)
+        self.assertEqual(list(final_index.get_terms()), [self.term1, self.term2, term3])
+        self.assertEqual(sorted(consumed_paths), index_paths)
+        doc_ids, frequencies = CompressionTools.p_for_delta_decompress(final_index.get_compressed_postings(self.term1))
+        self.assertEqual(doc_ids, [1, 2, 3, 4, 7, 9])
+        self.assertEqual(frequencies, [1, 6, 8, 6, 1, 1])
+
     def test_merge_empty_indices(self):
         """Test the case when no indices are provided."""
         with self.assertRaises(ValueError):
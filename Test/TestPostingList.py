@@ -0,0 +1,45 @@
+import unittest
+
+from Index.InvertedIndex.PostingList import PostingList
+from Utils.CompressionTools import CompressionTools
+
+
+class TestPostingList(unittest.TestCase):
+    def setUp(self):
+        """Set up a posting list spanning several blocks of the codec."""
+        self.doc_ids = list(range(3, 3000, 7))
+        self.frequencies = [doc_id % 5 + 1 for doc_id in self.doc_ids]
+        self.posting_list = PostingList(CompressionTools.p_for_delta_compress(self.doc_ids, self.frequencies))
+
+    def test_decode(self):
+        """Test that the list is decoded into the original doc_ids and frequencies."""
+        self.assertEqual(len(self.posting_list), len(self.doc_ids))
+        self.assertEqual(self.posting_list.doc_ids.tolist(), self.doc_ids)
+        self.assertEqual(self.posting_list.frequencies.tolist(), self.frequencies)
+
+    def test_iteration(self):
+        """Test that the cursor walks the postings in order and stops at the end."""
+        posting = self.posting_list.current()
+        walked = []
+        while posting is not None:
+            walked.append((posting.doc_id, posting.payload))
+            posting = self.posting_list.next()
+        self.assertEqual(walked, list(zip(self.doc_ids, self.frequencies)))
+
+    def test_next_geq(self):
+        """Test that next_geq reaches the first doc_id not lower than the target, only moving forward."""
+        self.assertEqual(self.posting_list.next_geq(50).doc_id, 52)
+        self.assertEqual(self.posting_list.next_geq(52).doc_id, 52)
+        self.assertEqual(self.posting_list.next_geq(10).doc_id, 52)
+        self.assertEqual(self.posting_list.next_geq(2000).doc_id, 2005)
+        self.assertIsNone(self.posting_list.next_geq(3000))
+
+    def test_empty(self):
+        """Test the cursor over an empty list."""
+        posting_list = PostingList(b"")
+        self.assertEqual(len(posting_list), 0)
+        self.assertIsNone(posting_list.current())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 
 from src.Utils.Preprocessing import Preprocessing
 
@@ -102,6 +103,26 @@ class TestPreprocessing(unittest.TestCase):
             with self.subTest(input=input_texts):
                 self.assertEqual(self.preprocessor.vectorized_preprocess(input_texts), expected_tokens)
 
+    def test_vectorized_preprocess_pool(self):
+        """Test that the texts preprocessed by a pool of workers match the sequential preprocessing."""
+        input_texts = ["Visit https://example.com today.", "", "Remove numbers like 1234."] * 10
+        self.assertEqual(self.preprocessor.vectorized_preprocess(input_texts, n_process=2),
+                         self.preprocessor.vectorized_preprocess(input_texts, n_process=1))
+
+    def test_default_num_workers_single_core(self):
+        """Test that a single available core never gives an empty pool."""
+        with mock.patch('os.sched_getaffinity', return_value={0}, create=True), \
+                mock.patch(f'{Preprocessing.__module__}.cpu_count', return_value=1):
+            self.assertEqual(Preprocessing._default_num_workers(), 1)
+
+    def test_vectorized_preprocess_flat(self):
+        """Test that the flat preprocessing output matches the per-text lists."""
+        input_texts = ["Visit https://example.com today.", "", "Remove numbers like 1234."]
+        tokens, offsets = self.preprocessor.vectorized_preprocess_flat(input_texts)
+
+        self.assertEqual(offsets.tolist(), [0, 2, 2, 5])
+        self.assertEqual(tokens, ["visit", "today", "remov", "number", "like"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -150,6 +150,25 @@ class TestQueryProcessor(unittest.TestCase):
         scores = list(ranked_docs.values())
         self.assertEqual(scores, sorted(scores, reverse=True))
 
+    def test_disjunctive_query_exhaustive(self):
+        """Test that the pruned disjunctive ranking matches the one obtained scoring every document."""
+        query = "where to eat pizza or pasta in rome"
+        for method in ("tfidf", "bm25"):
+            ranked_docs = self.query_processor.process_query(query, "disjunctive", method, max_results=5)
+
+            # Score every posting of every known query term
+            scores = {}
+            for term in set(self.query_parser.parse(query)):
+                for posting in self.inverted_index.get_uncompressed_postings(term):
+                    scores[posting.doc_id] = scores.get(posting.doc_id, 0) + \
+                        self.query_processor.scoring.compute_score(term, posting.doc_id, posting.payload, method)
+
+            expected_scores = sorted(scores.values(), reverse=True)[:5]
+            self.assertEqual(len(ranked_docs), len(expected_scores))
+            for (doc_id, score), expected_score in zip(ranked_docs.items(), expected_scores):
+                self.assertAlmostEqual(score, expected_score)
+                self.assertAlmostEqual(score, scores[doc_id])
+
     def test_empty_query(self):
         """Test the response to an empty query with default settings."""
         query = ""
@@ -1,6 +1,8 @@
 import math
 import unittest
 
+import numpy as np
+
 from Index.DocumentTable.DocumentTable import DocumentTable
 from Index.Lexicon.Lexicon import Lexicon
 from Query.Scoring import Scoring
@@ -79,6 +81,42 @@ class TestScoring(unittest.TestCase):
         expected_score = self.scoring.compute_bm25(term, doc_id, payload)
         self.assertAlmostEqual(score, expected_score)
 
+    def test_compute_scores(self):
+        """Test that the batch scores match the ones of compute_score, for both methods."""
+        doc_ids = np.array([1, 2, 3])
+        payloads = np.array([2, 1, 7])
+        for method in ("tfidf", "bm25"):
+            scores = self.scoring.compute_scores("term2", doc_ids, payloads, method)
+            for doc_id, payload, score in zip(doc_ids.tolist(), payloads.tolist(), scores.tolist()):
+                self.assertAlmostEqual(score, self.scoring.compute_score("term2", doc_id, payload, method))
+
+        with self.assertRaises(ValueError):
+            self.scoring.compute_scores("term2", doc_ids, payloads, "invalid_method")
+
+    def test_compute_scores_missing_documents(self):
+        """Test that the documents missing from the document table are scored as by compute_score."""
+        doc_ids = np.array([1, 4, 100])
+        payloads = np.array([2, 3, 5])
+        for method in ("tfidf", "bm25"):
+            scores = self.scoring.compute_scores("term1", doc_ids, payloads, method)
+            for doc_id, payload, score in zip(doc_ids.tolist(), payloads.tolist(), scores.tolist()):
+                self.assertAlmostEqual(score, self.scoring.compute_score("term1", doc_id, payload, method))
+
+        # Non-default BM25 parameters go through the document lengths instead of the precomputed normalizations
+        scores = self.scoring.compute_scores("term1", doc_ids, payloads, "bm25", k1=1.2, b=0.5)
+        self.assertAlmostEqual(scores[0], self.scoring.compute_bm25("term1", 1, 2, k1=1.2, b=0.5))
+        self.assertEqual(scores[1:].tolist(), [0.0, 0.0])
+
+    def test_compute_max_score(self):
+        """Test that the upper bound of a term is its highest score in a document."""
+        doc_ids = np.array([1, 2, 3])
+        payloads = np.array([2, 1, 7])
+        for method in ("tfidf", "bm25"):
+            expected_max_score = max(self.scoring.compute_score("term1", doc_id, payload, method)
+                                     for doc_id, payload in zip(doc_ids.tolist(), payloads.tolist()))
+            self.assertAlmostEqual(self.scoring.compute_max_score("term1", doc_ids, payloads, method),
+                                   expected_max_score)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -23,7 +23,7 @@ class EvaluationMain:
         self.query_parser = QueryParser(Preprocessing())
         self.lexicon = Lexicon.load_from_file(self.resources_path + "Lexicon")
         self.document_table = DocumentTable.load_from_file(self.resources_path + "DocumentTable")
-        self.inverted_index = CompressedInvertedIndex.load_compressed_index_to_memory(
+        self.inverted_index = CompressedInvertedIndex.load_compressed_index_mapped(
             self.resources_path + "InvertedIndex")
         self.query_processor = QueryProcessor(
             self.query_parser, self.lexicon, self.document_table, self.inverted_index
@@ -134,14 +134,15 @@ class EvaluationMain:
         ]
 
         # Process queries with progress bar
-        with tqdm(total=len(valid_queries) * 4, desc="Processing queries") as pbar:
+        with tqdm(total=len(valid_queries) * 4, desc="Processing queries", mininterval=1.0, smoothing=0) as pbar:
             for query_tuple in valid_queries:
                 for query_type in ["conjunctive", "disjunctive"]:
                     for method in ["tfidf", "bm25"]:
                         ndcg = self.process_query(query_tuple, query_type, method, qrels)
                         if ndcg is not None:
                             results[f"{query_type}_{method}"].append(ndcg)
-                        pbar.update(1)
+                # A single update per query, covering its 4 combinations
+                pbar.update(4)
 
         return results
 
@@ -154,7 +155,11 @@ class EvaluationMain:
         queries = self.load_queries(self.resources_path + "msmarco-test2020-queries.tsv")
 
         print("\nEvaluating queries...")
-        results = self.evaluate_all_queries(queries, qrels)
+        try:
+            results = self.evaluate_all_queries(queries, qrels)
+        finally:
+            # Release the memory map of the inverted index
+            self.inverted_index.close()
 
         print("\nFinal Results:")
         for combination, ndcg_scores in results.items():
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Iterable
 
 
 class DocumentTable:
@@ -16,6 +16,16 @@ class DocumentTable:
         """
         self._document_table[doc_id] = length
 
+    def add_documents_bulk(self, doc_ids: Iterable[int], lengths: Iterable[int]) -> None:
+        """
+        Adds several documents to the document table at once, with their lengths.
+
+        Args:
+            doc_ids (Iterable[int]): The unique identifiers of the documents.
+            lengths (Iterable[int]): The number of terms in each document.
+        """
+        self._document_table.update(zip(doc_ids, lengths))
+
     def get_document_length(self, doc_id: int) -> int:
         """
         Retrieves the length of a document.
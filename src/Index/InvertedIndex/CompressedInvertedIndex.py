@@ -1,14 +1,36 @@
+import mmap
+import os
 import struct
-from typing import List
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Tuple
+
+import numpy as np
 
 from Index.InvertedIndex.Posting import Posting
+from Index.InvertedIndex.PostingList import PostingList
 from Utils.CompressionTools import CompressionTools
 
+# Size of the buffer used to read index files: their entries are read with many small reads
+READ_BUFFER_SIZE = 1 << 20
+# Size of the buffer used to write index files, so that entries reach the disk in large writes
+WRITE_BUFFER_SIZE = 4 << 20
+# Number of decoded posting lists kept in memory, so that the terms shared by successive queries are decoded once
+DECODED_CACHE_SIZE = 8
+
 
 class CompressedInvertedIndex:
     def __init__(self):
         # Dict
         self._compressed_index = {}
+        # Read-only memory map of an index file, and dict of term -> (offset, length) of its compressed postings
+        self._mapped_file = None
+        self._mapped_directory = {}
+        # LRU of term -> (doc ids, frequencies) of the last decoded posting lists, shared by the decoding threads
+        self._decoded_cache = OrderedDict()
+        self._decoded_cache_lock = threading.Lock()
 
     def write_compressed_index_to_file(self, filename: str) -> None:
         """
@@ -17,16 +39,25 @@ class CompressedInvertedIndex:
         Args:
             filename (str): the path of the final file.
             """
-        with open(filename, 'wb') as f:
-            for term, compressed_data in self._compressed_index.items():
-                # Write the term as a UTF-8 encoded string
-                term_bytes = term.encode('utf-8')
-                f.write(struct.pack("H", len(term_bytes)))  # Write term length (2 bytes)
-                f.write(term_bytes)  # Write term
+        with open(filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            for term in self.get_terms():
+                self.write_entry(f, term, self.get_compressed_postings(term))
+
+    @staticmethod
+    def write_entry(f: BinaryIO, term: str, compressed_data: bytes) -> None:
+        """
+        Writes the compressed postings of a single term to an index file.
 
-                # Write the length of the compressed data (4 bytes)
-                f.write(struct.pack("I", len(compressed_data)))
-                f.write(compressed_data)  # Write compressed doc_ids and frequencies
+        Args:
+            f (BinaryIO): The index file, opened for binary writing.
+            term (str): The term of the postings.
+            compressed_data (bytes): The compressed postings.
+        """
+        # Write the header in a single call: term length (2 bytes), UTF-8 encoded term,
+        # length of the compressed data (4 bytes)
+        term_bytes = term.encode('utf-8')
+        f.write(struct.pack(f"=H{len(term_bytes)}sI", len(term_bytes), term_bytes, len(compressed_data)))
+        f.write(compressed_data)  # Write compressed doc_ids and frequencies
 
     @staticmethod
     def load_compressed_index_to_memory(filepath: str) -> 'CompressedInvertedIndex':
@@ -40,32 +71,121 @@ class CompressedInvertedIndex:
             CompressedInvertedIndex: The compressed inverted index structure saved in the file.
         """
         index = CompressedInvertedIndex()
+        index._compressed_index.update(CompressedInvertedIndex.iter_compressed_index_file(filepath))
+        return index
+
+    @staticmethod
+    def load_compressed_index_mapped(filepath: str) -> 'CompressedInvertedIndex':
+        """
+        Opens a compressed inverted index file as a read-only memory map. Only the entry headers are parsed,
+        to locate the postings of every term: the postings stay on disk, shared with the page cache, and are
+        read on demand when their term is queried. The returned index cannot be modified.
+
+        Args:
+            filepath (str): The path of the index to open.
+
+        Returns:
+            CompressedInvertedIndex: The compressed inverted index backed by the file.
+        """
+        index = CompressedInvertedIndex()
+        if os.path.getsize(filepath) == 0:
+            return index
+
         with open(filepath, 'rb') as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Walk the headers: term length (2 bytes), UTF-8 encoded term, length of the compressed data (4 bytes)
+        directory = index._mapped_directory
+        position, file_size = 0, len(mapped_file)
+        try:
+            while position < file_size:
+                if position + 2 > file_size:
+                    raise ValueError("Unexpected end of file when reading term length")
+                term_length, = struct.unpack_from("=H", mapped_file, position)
+                term = mapped_file[position + 2:position + 2 + term_length].decode('utf-8')
+                position += 2 + term_length
+                if position + 4 > file_size:
+                    raise ValueError("Unexpected end of file when reading compressed length")
+                compressed_length, = struct.unpack_from("=I", mapped_file, position)
+                position += 4
+
+                # Integrity check
+                if position + compressed_length > file_size:
+                    raise ValueError("Mismatch between expected and actual compressed length")
+                directory[term] = (position, compressed_length)
+                position += compressed_length
+        except Exception:
+            mapped_file.close()
+            raise
+
+        index._mapped_file = mapped_file
+        return index
+
+    def close(self) -> None:
+        """
+        Releases the memory map of an index opened with load_compressed_index_mapped. The index is empty
+        afterwards. Closing an index that is not mapped does nothing.
+        """
+        if self._mapped_file is not None:
+            self._mapped_directory = {}
+            with self._decoded_cache_lock:
+                self._decoded_cache.clear()
+            self._mapped_file.close()
+            self._mapped_file = None
+
+    @staticmethod
+    @contextmanager
+    def open_index_file(filepath: str) -> Iterator[BinaryIO]:
+        """
+        Open an index file for a sequential read, through a large buffer so that the small reads of its
+        entries do not turn into as many system calls. The kernel is advised to read ahead aggressively.
+
+        Args:
+            filepath (str): The path of the index to read.
+
+        Yields:
+            BinaryIO: The buffered index file.
+        """
+        with open(filepath, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            yield f
+
+    @staticmethod
+    def iter_compressed_index_file(filepath: str) -> Iterator[Tuple[str, bytes]]:
+        """
+        Streams the entries of a compressed inverted index file, in the order they were written,
+        without loading the whole index into memory.
+
+        Args:
+            filepath (str): The path of the index to read.
+
+        Yields:
+            Tuple[str, bytes]: A term and its compressed postings.
+        """
+        with CompressedInvertedIndex.open_index_file(filepath) as f:
             while True:
                 # Read the term length (2 bytes)
                 term_length_bytes = f.read(2)
                 if not term_length_bytes:
                     break  # End of file
 
-                term_length = struct.unpack("H", term_length_bytes)[0]
+                term_length = int.from_bytes(term_length_bytes, sys.byteorder)
                 term = f.read(term_length).decode('utf-8')  # Decode the term
 
                 # Read the compressed data length (4 bytes)
                 compressed_length_bytes = f.read(4)
-                if not compressed_length_bytes:
+                if len(compressed_length_bytes) != 4:
                     raise ValueError("Unexpected end of file when reading compressed length")
 
-                compressed_length = struct.unpack("I", compressed_length_bytes)[0]
+                compressed_length = int.from_bytes(compressed_length_bytes, sys.byteorder)
                 compressed_data = f.read(compressed_length)
 
                 # Integrity check
                 if len(compressed_data) != compressed_length:
                     raise ValueError("Mismatch between expected and actual compressed length")
 
-                # Store the compressed data in memory
-                index._compressed_index[term] = compressed_data
-
-        return index
+                yield term, compressed_data
 
     def get_compressed_postings(self, term: str) -> bytes:
         """
@@ -77,16 +197,29 @@ class CompressedInvertedIndex:
         Returns:
             bytes: The compressed postings.
         """
+        if self._mapped_file is not None:
+            entry = self._mapped_directory.get(term)
+            if entry is None:
+                return b''  # Return empty bytes if term not found
+            offset, length = entry
+            return self._mapped_file[offset:offset + length]
         return self._compressed_index.get(term, b'')  # Return empty bytes if term not found
 
     def add_compressed_postings(self, term: str, compressed_postings: bytes) -> None:
         """
-        Add compressed postings for a term to the index.
+        Add compressed postings for a term to the index. Empty postings are not added, so that readers
+        never need to check for them.
 
         Args:
             term: The term for which the postings are being added.
             compressed_postings: The compressed postings as a byte string.
         """
+        if not compressed_postings:
+            return
+        if self._mapped_file is not None:
+            raise ValueError("A memory-mapped index cannot be modified.")
+        with self._decoded_cache_lock:
+            self._decoded_cache.pop(term, None)
         if term in self._compressed_index:
             # If the term already exists, concatenate the new postings
             self._compressed_index[term] += compressed_postings
@@ -98,11 +231,15 @@ class CompressedInvertedIndex:
         """
         Getter for terms.
         """
+        if self._mapped_file is not None:
+            return self._mapped_directory.keys()
         return self._compressed_index.keys()
 
     def get_uncompressed_postings(self, term: str) -> List[Posting]:
         """
-        Fetches the uncompressed postings for a given term as a list of Posting objects.
+        Fetches the uncompressed postings for a given term as a list of Posting objects. Query processing
+        works on the parallel arrays of get_posting_arrays instead: Posting objects are only built here, at the
+        boundary of the API.
 
         Args:
             term (str): The term for which the postings are being fetched.
@@ -110,13 +247,48 @@ class CompressedInvertedIndex:
         Returns:
             List[Posting]: A list of Posting objects, or an empty list if the term is not found.
         """
-        compressed_postings = self.get_compressed_postings(term)
-        if compressed_postings:
-            doc_ids, frequencies = CompressionTools.p_for_delta_decompress(compressed_postings)
-            # Convert doc_ids and frequencies to a list of Posting objects
-            list_postings = [Posting(doc_id=doc_id, payload=freq) for doc_id, freq in zip(doc_ids, frequencies)]
-            return list_postings
-        return []
+        doc_ids, frequencies = self.get_posting_arrays(term)
+        # Convert the shared decoded arrays to a list of Posting objects
+        return list(map(Posting, doc_ids.tolist(), frequencies.tolist()))
+
+    def get_posting_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fetches the uncompressed postings for a given term as parallel NumPy arrays, without building
+        Posting objects. The last decoded lists are cached, so the returned arrays are read-only.
+
+        Args:
+            term (str): The term for which the postings are being fetched.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The doc ids and the frequencies, empty if the term is not found.
+        """
+        with self._decoded_cache_lock:
+            decoded = self._decoded_cache.get(term)
+            if decoded is not None:
+                self._decoded_cache.move_to_end(term)
+                return decoded
+
+        # Decode outside of the lock, so that several lists can be decoded at the same time
+        decoded = CompressionTools.p_for_delta_decompress_arrays(self.get_compressed_postings(term))
+        for array in decoded:
+            array.flags.writeable = False
+        with self._decoded_cache_lock:
+            self._decoded_cache[term] = decoded
+            if len(self._decoded_cache) > DECODED_CACHE_SIZE:
+                self._decoded_cache.popitem(last=False)
+        return decoded
+
+    def get_posting_list(self, term: str) -> PostingList:
+        """
+        Fetches a cursor over the postings of a given term, sharing the cached decoded lists.
+
+        Args:
+            term (str): The term for which the postings are being fetched.
+
+        Returns:
+            PostingList: The cursor over the postings, empty if the term is not found.
+        """
+        return PostingList.from_arrays(*self.get_posting_arrays(term))
 
     def compress_and_add_postings(self, term: str, doc_ids: List[int], frequencies: List[int]) -> None:
         """
@@ -1,15 +1,36 @@
-import struct
-from collections import defaultdict
-from typing import Any, List
+import sys
+from array import array
+from typing import Any, Iterable, List, Tuple
+
+import numpy as np
 
 from Utils.CompressionTools import CompressionTools
+from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex, WRITE_BUFFER_SIZE
 from Index.InvertedIndex.Posting import Posting
 
+# Term frequencies are stored on 16 bits: larger values are clipped
+MAX_FREQUENCY = 65535
+
 
 class InvertedIndex:
     def __init__(self):
-        # Default Dict
-        self._index = defaultdict(list)
+        # Dict of term -> (doc ids, frequencies), stored as two parallel compact arrays
+        self._index = {}
+
+    def _get_or_create_arrays(self, term: str) -> Tuple[array, array]:
+        """
+        Fetches the posting arrays of a term, creating empty ones if the term is new.
+
+        Args:
+            term (str): The term to fetch the arrays of.
+
+        Returns:
+            Tuple[array, array]: The uint32 doc ids and uint16 frequencies of the term.
+        """
+        arrays = self._index.get(term)
+        if arrays is None:
+            arrays = self._index[term] = (array('I'), array('H'))
+        return arrays
 
     def add_posting(self, term: str, doc_id: int, payload: Any = None) -> None:
         """
@@ -20,7 +41,67 @@ class InvertedIndex:
             doc_id (int): The id of the document to add to the list.
             payload (Any): The optional frequency of the term in the document.
         """
-        self._index[term].append(Posting(doc_id, payload))
+        doc_ids, frequencies = self._get_or_create_arrays(term)
+        doc_ids.append(doc_id)
+        frequencies.append(min(payload or 0, MAX_FREQUENCY))
+
+    def add_postings_bulk(self, terms: Iterable[str], doc_id: int, payloads: Iterable[Any]) -> None:
+        """
+        Adds a document to the posting lists of several terms at once, with the matching payloads.
+
+        Args:
+            terms (Iterable[str]): The terms contained in the document.
+            doc_id (int): The id of the document to add to the lists.
+            payloads (Iterable[Any]): The frequency of each term in the document.
+        """
+        get_or_create_arrays = self._get_or_create_arrays
+        for term, payload in zip(terms, payloads):
+            doc_ids, frequencies = get_or_create_arrays(term)
+            doc_ids.append(doc_id)
+            frequencies.append(min(payload, MAX_FREQUENCY))
+
+    def add_postings(self, term: str, postings: List[Posting]) -> None:
+        """
+        Appends an already built list of postings to the posting list of a term.
+
+        Args:
+            term (str): The term to add the postings to.
+            postings (List[Posting]): The postings to append, sorted by doc_id.
+        """
+        doc_ids, frequencies = self._get_or_create_arrays(term)
+        doc_ids.extend(posting.doc_id for posting in postings)
+        frequencies.extend(min(posting.payload, MAX_FREQUENCY) for posting in postings)
+
+    def add_posting_arrays(self, term: str, doc_ids: np.ndarray, frequencies: np.ndarray) -> None:
+        """
+        Appends the postings of a term given as NumPy arrays, copying their memory directly.
+
+        Args:
+            term (str): The term to add the postings to.
+            doc_ids (np.ndarray): The doc ids to append, sorted.
+            frequencies (np.ndarray): The frequency of the term in each document.
+        """
+        term_doc_ids, term_frequencies = self._get_or_create_arrays(term)
+        # The arrays are copied straight from the NumPy buffers, as raw bytes.
+        # Frequencies already stored as uint16 are copied as they are, without clipping them again.
+        doc_ids = np.ascontiguousarray(doc_ids, dtype=np.uint32)
+        if frequencies.dtype != np.uint16:
+            frequencies = np.minimum(frequencies, MAX_FREQUENCY).astype(np.uint16)
+        term_doc_ids.frombytes(memoryview(doc_ids).cast('B'))
+        term_frequencies.frombytes(memoryview(np.ascontiguousarray(frequencies)).cast('B'))
+
+    def merge(self, other: 'InvertedIndex') -> None:
+        """
+        Appends all the postings of another index to this one. The documents of the other index
+        must all follow the ones of this index, so that the posting lists stay sorted.
+
+        Args:
+            other (InvertedIndex): The index to merge into this one.
+        """
+        for term, (other_doc_ids, other_frequencies) in other._index.items():
+            doc_ids, frequencies = self._get_or_create_arrays(term)
+            doc_ids.extend(other_doc_ids)
+            frequencies.extend(other_frequencies)
 
     def get_postings(self, term: str) -> List[Posting]:
         """
@@ -32,7 +113,26 @@ class InvertedIndex:
         Returns:
             List[Posting]: The list of postings.
         """
-        return self._index.get(term, [])
+        doc_ids, frequencies = self.get_posting_arrays(term)
+        return list(map(Posting, doc_ids, frequencies))
+
+    def get_posting_arrays(self, term: str) -> Tuple[array, array]:
+        """
+        Fetches the posting list for a given term as parallel arrays, without building Posting objects.
+
+        Args:
+            term (str): The term to fetch the list of.
+
+        Returns:
+            Tuple[array, array]: The doc ids and the frequencies of the term, empty if the term is missing.
+        """
+        return self._index.get(term) or (array('I'), array('H'))
+
+    def get_terms(self):
+        """
+        Getter for terms.
+        """
+        return self._index.keys()
 
     @staticmethod
     def load_compressed_index_from_file(filepath: str) -> 'InvertedIndex':
@@ -47,42 +147,36 @@ class InvertedIndex:
             InvertedIndex: an uncompressed InvertedIndex object.
         """
         index = InvertedIndex()
-        with open(filepath, 'rb') as f:
+        with CompressedInvertedIndex.open_index_file(filepath) as f:
             while True:
                 # Read the term
                 term_length_bytes = f.read(2)
                 if not term_length_bytes:
                     break
-                term_length = struct.unpack("H", term_length_bytes)[0]
+                term_length = int.from_bytes(term_length_bytes, sys.byteorder)
                 term = f.read(term_length).decode('utf-8')
 
                 # Read the compressed data
-                compressed_length = struct.unpack("I", f.read(4))[0]
+                compressed_length = int.from_bytes(f.read(4), sys.byteorder)
                 compressed_doc_ids = f.read(compressed_length)
                 doc_ids, frequencies = CompressionTools.p_for_delta_decompress(compressed_doc_ids)
-                for doc_id, frequency in zip(doc_ids, frequencies):
-                    index.add_posting(term, doc_id, frequency)
+                index.add_posting_arrays(term, np.asarray(doc_ids), np.asarray(frequencies))
 
         return index
 
     def write_index_compressed_to_file(self, filepath: str) -> None:
         """
-        Writes the inverted index to a file using PForDelta compression.
+        Writes the inverted index to a file using PForDelta compression. Terms are written in sorted order,
+        so that several indices can be merged in a single streaming pass.
 
         Args:
             filepath(str): The path where to write the compressed index to.
         """
-        with open(filepath, 'wb') as f:
-            for term, postings in self._index.items():
-                # Write the term as a UTF-8 encoded string
-                term_bytes = term.encode('utf-8')
-                f.write(struct.pack("H", len(term_bytes)))
-                f.write(term_bytes)
+        with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            for term, (doc_ids, frequencies) in sorted(self._index.items()):
+                # Terms without postings are not written, so that readers never need to check for them
+                if not doc_ids:
+                    continue
 
-                doc_ids = [posting.doc_id for posting in postings]
-                frequencies = [posting.payload for posting in postings]
                 compressed_doc_ids = CompressionTools.p_for_delta_compress(doc_ids, frequencies)
-
-                # Write the compressed doc_ids
-                f.write(struct.pack("I", len(compressed_doc_ids)))
-                f.write(compressed_doc_ids)
+                CompressedInvertedIndex.write_entry(f, term, compressed_doc_ids)
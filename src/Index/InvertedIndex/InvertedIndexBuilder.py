@@ -1,21 +1,30 @@
+import concurrent.futures
 import gc
 import os
-from typing import List, Optional
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
 from Index.DocumentTable.DocumentTable import DocumentTable
 from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex
-from Index.InvertedIndex.InvertedIndex import InvertedIndex
+from Index.InvertedIndex.InvertedIndex import InvertedIndex, MAX_FREQUENCY
 from Index.InvertedIndex.Merger import Merger
 from Index.Lexicon.Lexicon import Lexicon
 from Utils.CollectionLoader import CollectionLoader
 from Utils.MemoryProfile import MemoryProfile
-from Utils.MemoryTrackingTools import MemoryTrackingTools
+from Utils.MemoryTrackingTools import AVAILABLE_MEMORY_TTL, MemoryTrackingTools
 from Utils.Preprocessing import Preprocessing
 from Utils.config import RESOURCES_PATH
 
+# Number of chunks processed between two polls of the available memory, in dynamic chunking
+MEMORY_POLL_INTERVAL = 10
+# Weight of the latest observation in the moving average of the memory retained per document
+MEMORY_EMA_WEIGHT = 0.1
+
 
 class InvertedIndexBuilder:
     def __init__(
@@ -25,6 +34,8 @@ class InvertedIndexBuilder:
             merger: Merger,
             lexicon: Lexicon,
             document_table: DocumentTable,
+            max_workers: int = 1,
+            flush_every: int = 1,
     ) -> None:
         """
         Initialize the InvertedIndexBuilder with necessary components.
@@ -35,6 +46,11 @@ class InvertedIndexBuilder:
             merger: Component for merging partial indices.
             lexicon: Lexicon structure to be built alongside the inverted index.
             document_table: DocumentTable structure to be built alongside inverted index.
+            max_workers: Number of worker processes building partial indices in parallel.
+            Default is 1, which processes the chunks sequentially in the current process.
+            flush_every: Number of consecutive chunks buffered in memory into a single partial index before it
+            is written, when processing sequentially. Fewer, larger partial indices make the final merge cheaper.
+            Default is 1, which writes a partial index per chunk.
         """
         self.collection_loader = collection_loader
         self.preprocessing = preprocessing
@@ -42,17 +58,46 @@ class InvertedIndexBuilder:
         self.merger = merger
         self.lexicon = lexicon
         self.document_table = document_table
+        self.max_workers = max(1, max_workers)
+        self.flush_every = max(1, flush_every)
         # Memory tracking tools for dynamic chunking
         self.memory_tools = MemoryTrackingTools()
         # Global path to resources
         self.resources_path = RESOURCES_PATH
+        # Vocabulary shared across chunks, mapping each token to an integer id and back
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+
+    def _intern(self, token: str) -> int:
+        """
+        Maps a token to its integer id, assigning the next free id the first time the token is seen.
 
-    def process_chunk(self, chunk: pd.DataFrame) -> InvertedIndex:
+        Args:
+            token(str): The token to map.
+
+        Returns:
+            int: The id of the token in the builder vocabulary.
+        """
+        term_id = self._vocab.get(token)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._vocab[token] = term_id
+            self._terms.append(token)
+        return term_id
+
+    def process_chunk(self, chunk: pd.DataFrame, postings_only: bool = False, drop_text: bool = True,
+                      n_process: Optional[int] = None) -> InvertedIndex:
         """
         Process a chunk of documents into a partial index.
 
         Args:
             chunk(pd.DataFrame): DataFrame containing documents to process
+            postings_only(bool): If True, only the postings are built and neither the lexicon nor
+            the document table are updated. Default is False.
+            drop_text(bool): If True, the 'text' column is dropped from the chunk as soon as it has been
+            preprocessed, to avoid holding the raw text and the tokens at the same time. Default is True.
+            n_process(Optional[int]): Number of processes preprocessing the chunk, 1 to preprocess it in the
+            current process. Default is the preprocessing default.
 
         Returns:
             InvertedIndex: Partial inverted index for the chunk
@@ -61,41 +106,71 @@ class InvertedIndexBuilder:
             return InvertedIndex()
 
         chunk_index = InvertedIndex()
-        # Vectorized preprocessing for speed
-        tokens_list = self.preprocessing.vectorized_preprocess(chunk['text'])
-
-        doc_lengths = chunk['text'].str.split().str.len()
-
-        # Update document table
-        for doc_id, length in zip(chunk['index'], doc_lengths):
-            self.document_table.add_document(doc_id, length)
-
-        # Track document frequency for tokens for Lexicon
-        doc_frequency_map = {}
-
-        # Process tokens and update the index
-        for doc_id, tokens in zip(chunk['index'], tokens_list):
-            if not tokens:  # Skip empty documents
-                continue
-
-            # Count frequencies once per document
-            token_freq_map = {}
-            for token in tokens:
-                if token:  # Skip empty tokens
-                    token_freq_map[token] = token_freq_map.get(token, 0) + 1
-
-                    # Track unique document IDs for each token
-                    if token not in doc_frequency_map:
-                        doc_frequency_map[token] = set()
-                    doc_frequency_map[token].add(doc_id)
-
-            # Update the inverted index
-            for token, freq in token_freq_map.items():
-                chunk_index.add_posting(token, doc_id, freq)
-
-        # Update the lexicon with document frequency
-        for token, doc_ids in doc_frequency_map.items():
-            self.lexicon.add_term(token, document_frequency=len(doc_ids))
+        doc_ids = chunk['index'].to_numpy()
+
+        if not postings_only:
+            # Count the whitespace-separated words with a single regex pass, without materializing the
+            # split lists, and update the document table with a single bulk insert
+            doc_lengths = chunk['text'].str.count(r'\S+')
+            self.document_table.add_documents_bulk(doc_ids.tolist(), doc_lengths.to_numpy().tolist())
+
+        # Vectorized preprocessing for speed, into a flat list of tokens with per-document offsets
+        tokens, offsets = self.preprocessing.vectorized_preprocess_flat(chunk['text'], n_process)
+
+        # The raw text is not needed anymore: release it before counting the tokens
+        if drop_text:
+            chunk.drop(columns=['text'], inplace=True)
+
+        # Map every token of the chunk to its vocabulary id, into a flat array aligned with the position
+        # of the document each token belongs to. The tokens are factorized with a C-level hash table,
+        # so only the distinct tokens of the chunk go through the vocabulary.
+        num_docs = len(offsets) - 1
+        token_codes, chunk_vocabulary = pd.factorize(np.asarray(tokens, dtype=object))
+        doc_positions = np.repeat(np.arange(num_docs, dtype=np.int32), np.diff(offsets))
+        del tokens
+
+        # Skip empty tokens
+        if '' in chunk_vocabulary:
+            non_empty = token_codes != chunk_vocabulary.get_loc('')
+            token_codes = token_codes[non_empty]
+            doc_positions = doc_positions[non_empty]
+
+        if postings_only:
+            # The builder vocabulary is left untouched: the term ids are local to the chunk
+            terms = chunk_vocabulary.tolist()
+            term_ids = token_codes.astype(np.int32)
+        else:
+            terms = self._terms
+            vocabulary_ids = np.fromiter(map(self._intern, chunk_vocabulary), dtype=np.int32,
+                                         count=len(chunk_vocabulary))
+            term_ids = vocabulary_ids[token_codes]
+        del token_codes
+
+        # Count the occurrences of each (term, document) pair at once: the sorted unique keys
+        # group the postings by term, each list ordered by the position of the document in the chunk.
+        # The ids and positions are kept as int32, only the combined keys need 64 bits.
+        pair_keys, frequencies = np.unique(term_ids.astype(np.int64) * num_docs + doc_positions, return_counts=True)
+        del term_ids, doc_positions
+        if not pair_keys.size:
+            return chunk_index
+        pair_term_ids = pair_keys // num_docs
+        # Convert the postings to the storage types once for the whole chunk:
+        # every term then only copies its slice of the arrays
+        posting_doc_ids = doc_ids[pair_keys % num_docs].astype(np.uint32)
+        frequencies = np.minimum(frequencies, MAX_FREQUENCY).astype(np.uint16)
+
+        # Split the postings by term, resolving the ids back to strings once per term
+        boundaries = np.concatenate(([0], np.flatnonzero(np.diff(pair_term_ids)) + 1, [len(pair_keys)]))
+        starts = boundaries[:-1].tolist()
+        ends = boundaries[1:].tolist()
+        chunk_terms = [terms[term_id] for term_id in pair_term_ids[starts].tolist()]
+        for term, start, end in zip(chunk_terms, starts, ends):
+            chunk_index.add_posting_arrays(term, posting_doc_ids[start:end], frequencies[start:end])
+
+        if not postings_only:
+            # Each document contributes a single posting per token, so the document
+            # frequency of a token in the chunk is the length of its posting list
+            self.lexicon.add_terms_bulk(chunk_terms, np.diff(boundaries).tolist())
 
         return chunk_index
 
@@ -111,7 +186,7 @@ class InvertedIndexBuilder:
             MemoryProfile: Memory usage estimates
         """
         # Measure initial memory state
-        initial_memory = self.memory_tools.get_available_memory()
+        initial_memory = self.memory_tools.get_available_memory(max_age=AVAILABLE_MEMORY_TTL)
         total_memory = self.memory_tools.get_total_memory()
         gc.collect()  # Force clean up before profiling
 
@@ -119,8 +194,9 @@ class InvertedIndexBuilder:
         try:
             sample_chunk = self.collection_loader.process_single_chunk(0, sample_size)
 
-            # Process the sample and measure total memory impact
-            _ = self.process_chunk(sample_chunk)
+            # Process the sample and measure total memory impact. Only the postings are built, so that
+            # the profiling run does not leave the sample documents in the lexicon and document table.
+            _ = self.process_chunk(sample_chunk, postings_only=True)
             post_process_memory = self.memory_tools.get_available_memory()
 
             # Calculate memory usage per document including overhead
@@ -137,26 +213,61 @@ class InvertedIndexBuilder:
             # Clean up profiling data
             gc.collect()
 
-    def _process_and_save_chunk(self, chunk: DataFrame, index_num: int) -> str:
+    def _partial_index_path(self, index_num: int) -> str:
+        """
+        Path of a partial compressed index.
+
+        Args:
+            index_num(int): Ordinal number of the partial index.
+
+        Returns:
+            str: The path to the partial inverted index.
+        """
+        return self.resources_path + f"Compressed_Index_{index_num}.vb"
+
+    def _process_and_save_chunk(self, chunk: DataFrame, index_num: int, postings_only: bool = False,
+                                writer: Optional[concurrent.futures.Executor] = None) -> \
+            Tuple[str, Optional[concurrent.futures.Future]]:
         """
         Process a chunk and save its partial compressed index.
 
         Args:
             chunk(DataFrame): Chunk of documents to process.
             index_num(int): Ordinal number to track the partial indices building.
+            postings_only(bool): Whether to skip the lexicon and document table updates. Default is False.
+            writer(Optional[concurrent.futures.Executor]): If given, the index is written by this executor
+            instead of synchronously. Default is None.
 
         Returns:
-            str: The path to the partial inverted index.
+            Tuple[str, Optional[concurrent.futures.Future]]: The path to the partial inverted index and, when
+            a writer is given, the future of the pending write.
         """
-        chunk_index = self.process_chunk(chunk)
-        index_path = self.resources_path + f"Compressed_Index_{index_num}.vb"
-        chunk_index.write_index_compressed_to_file(index_path)
+        chunk_index = self.process_chunk(chunk, postings_only=postings_only)
+        return self._save_partial_index(chunk_index, index_num, writer)
 
-        # Free up the memory used and force garbage collection
-        del chunk_index
-        gc.collect()
+    def _save_partial_index(self, index: InvertedIndex, index_num: int,
+                            writer: Optional[concurrent.futures.Executor] = None) -> \
+            Tuple[str, Optional[concurrent.futures.Future]]:
+        """
+        Save a partial compressed index, either synchronously or through a writer executor.
 
-        return index_path
+        Args:
+            index(InvertedIndex): The partial index to save.
+            index_num(int): Ordinal number to track the partial indices building.
+            writer(Optional[concurrent.futures.Executor]): If given, the index is written by this executor
+            instead of synchronously. Default is None.
+
+        Returns:
+            Tuple[str, Optional[concurrent.futures.Future]]: The path to the partial inverted index and, when
+            a writer is given, the future of the pending write.
+        """
+        index_path = self._partial_index_path(index_num)
+
+        if writer is not None:
+            return index_path, writer.submit(index.write_index_compressed_to_file, index_path)
+
+        index.write_index_compressed_to_file(index_path)
+        return index_path, None
 
     def build_partial_indices(self, use_static_chunk_size: bool = False, static_chunk_size: Optional[int] = None) -> \
             List[str]:
@@ -194,42 +305,59 @@ class InvertedIndexBuilder:
         # Safe limit for the initial run, in which the profiler tends to underestimate memory impact.
         if memory_profile.estimated_chunk_size > 1000000:
             print("Using default chunk size of 1.0 million documents")
+
         # Process the collection in chunks
-        partial_indices_paths: List[str] = []
+        return self._write_partial_indices(self._iter_dynamic_chunks(total_docs, memory_profile))
+
+    def _iter_dynamic_chunks(self, total_docs: int, memory_profile: MemoryProfile) -> Iterator[pd.DataFrame]:
+        """
+        Read the collection in chunks sized on the currently available memory, in a single pass over the file.
+
+        Args:
+            total_docs(int): Total number of documents in the collection.
+            memory_profile(MemoryProfile): Memory usage estimates from the profiling run.
+
+        Yields:
+            pd.DataFrame: Chunk of documents.
+        """
+        # When several chunks are processed at the same time, the memory is shared between them
+        max_chunk_size = max(1, min(memory_profile.estimated_chunk_size, 1000000) // self.max_workers)
+        lines = self.collection_loader.stream()
         chunk_start = 0
 
+        # The available memory is only polled every few chunks. In between, it is estimated from the
+        # memory retained per processed document (lexicon and document table growth), smoothed over the polls.
+        polled_available = current_available = self.memory_tools.get_available_memory(max_age=AVAILABLE_MEMORY_TTL)
+        retained_per_doc = 0.0
+        docs_since_poll = 0
+        chunks_since_poll = 0
+
         while chunk_start < total_docs:
             # Adjust chunk size based on available memory
-            current_available = self.memory_tools.get_available_memory()
-            current_chunk_size = min(
-                min(memory_profile.estimated_chunk_size, 1000000),
-                total_docs - chunk_start
-            )
+            current_chunk_size = min(max_chunk_size, total_docs - chunk_start)
 
-            if current_available < memory_profile.memory_per_doc * current_chunk_size:
+            if current_available < memory_profile.memory_per_doc * current_chunk_size * self.max_workers:
                 # Reduce chunk size if memory is tight
-                current_chunk_size = int(current_available * 0.8 / memory_profile.memory_per_doc)
+                current_chunk_size = max(
+                    1, int(current_available * 0.8 / memory_profile.memory_per_doc / self.max_workers)
+                )
                 print(f"Adjusting chunk size to {current_chunk_size} due to memory constraints")
 
-            current_chunk = self.collection_loader.process_single_chunk(
-                chunk_start,
-                current_chunk_size
-            )
-
-            # Process and save the chunk
-            index_path = self.resources_path + f"Compressed_Index_{len(partial_indices_paths) + 1}.vb"
-            chunk_index = self.process_chunk(current_chunk)
-            chunk_index.write_index_compressed_to_file(index_path)
-            partial_indices_paths.append(index_path)
-
-            # Clean up memory
-            del current_chunk
-            del chunk_index
-            gc.collect()
+            yield self.collection_loader.lines_to_dataframe(islice(lines, current_chunk_size))
 
             chunk_start += current_chunk_size
-
-        return partial_indices_paths
+            docs_since_poll += current_chunk_size
+            chunks_since_poll += 1
+
+            if chunks_since_poll >= MEMORY_POLL_INTERVAL:
+                current_available = self.memory_tools.get_available_memory()
+                observed_per_doc = max(0.0, (polled_available - current_available) / docs_since_poll)
+                retained_per_doc = (1 - MEMORY_EMA_WEIGHT) * retained_per_doc + MEMORY_EMA_WEIGHT * observed_per_doc
+                polled_available = current_available
+                docs_since_poll = 0
+                chunks_since_poll = 0
+            else:
+                current_available -= retained_per_doc * current_chunk_size
 
     def build_full_index(self, use_static_chunk_size: bool = False, static_chunk_size: Optional[int] = None) -> None:
         """
@@ -240,47 +368,69 @@ class InvertedIndexBuilder:
             use_static_chunk_size(bool): Whether to use or not the static chunking option. Default is False.
             static_chunk_size(Optional[int]): If the static chunking is used, size of the chunk.
         """
+        # The automatic collector would keep walking the growing lexicon and document table:
+        # it is paused for the whole build. Chunks are processed into NumPy arrays, which hold no
+        # reference cycles, so a single explicit collection between the chunk and merge stages suffices.
+        gc.disable()
+        gc.freeze()
         try:
             partial_indices_paths = self.build_partial_indices(use_static_chunk_size, static_chunk_size)
+            gc.collect()
 
             # Save auxiliary structures
             self.lexicon.write_to_file(self.resources_path + "Lexicon")
             self.document_table.write_to_file(self.resources_path + "DocumentTable")
 
-            # Merge indices
+            # Merge indices straight into the final index file, unlinking each partial index in the background
+            # as soon as it has been read entirely
             print("Merging indices...")
-            self.compressed_inverted_index = self.merger.merge_multiple_compressed_indices(
-                partial_indices_paths
-            )
-
-            # Save final index and clean up
-            self.compressed_inverted_index.write_compressed_index_to_file(self.resources_path + "InvertedIndex")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as unlink_executor:
+                num_terms = self.merger.merge_compressed_index_files(
+                    partial_indices_paths,
+                    self.resources_path + "InvertedIndex",
+                    on_consumed=lambda path: unlink_executor.submit(os.unlink, path)
+                )
+
+            # Clean up whatever the merger did not already delete
             self._delete_partial_indices(partial_indices_paths)
 
-            print(f"Index built successfully with {len(self.compressed_inverted_index.get_terms())} unique terms.")
+            # The merged index stays on disk, mapped in memory so that it is available through get_index
+            self.compressed_inverted_index.close()
+            self.compressed_inverted_index = CompressedInvertedIndex.load_compressed_index_mapped(
+                self.resources_path + "InvertedIndex"
+            )
+
+            print(f"Index built successfully with {num_terms} unique terms.")
 
         except Exception as e:
             print(f"Error building full index: {str(e)}")
             raise
 
-    def build_partial_index(self, sample_size: int = 10000) -> None:
+        finally:
+            gc.unfreeze()
+            gc.enable()
+
+    def build_partial_index(self, sample_size: int = 10000, postings_only: bool = False) -> None:
         """
         Build a partial compressed inverted index for testing.
 
         Args:
             sample_size(int): Number of documents to sample. Default 10000.
+            postings_only(bool): If True, only the inverted index is built, while the lexicon and
+            the document table are neither updated nor saved. Default is False.
         """
         try:
             sample_df = self.collection_loader.sample_lines(sample_size)
-            index_path = self._process_and_save_chunk(sample_df, 1)
+            index_path, _ = self._process_and_save_chunk(sample_df, 1, postings_only=postings_only)
 
             self.compressed_inverted_index = (
                 self.compressed_inverted_index.load_compressed_index_to_memory(index_path)
             )
 
-            # Save auxiliary structures
-            self.lexicon.write_to_file(self.resources_path + "partial_lexicon.txt")
-            self.document_table.write_to_file(self.resources_path + "partial_document_table.txt")
+            if not postings_only:
+                # Save auxiliary structures
+                self.lexicon.write_to_file(self.resources_path + "partial_lexicon.txt")
+                self.document_table.write_to_file(self.resources_path + "partial_document_table.txt")
 
             print(f"Partial index built with {len(self.compressed_inverted_index.get_terms())} unique terms.")
 
@@ -301,38 +451,130 @@ class InvertedIndexBuilder:
         total_docs = self.collection_loader.get_total_docs()
         print(f"Processing {total_docs} documents with static chunk size of {static_chunk_size}...")
 
+        return self._write_partial_indices(self.collection_loader.process_chunks(static_chunk_size))
+
+    def _write_partial_indices(self, chunks: Iterator[pd.DataFrame]) -> List[str]:
+        """
+        Process each chunk into a partial compressed index saved to disk, either sequentially
+        or in parallel worker processes depending on max_workers.
+
+        Args:
+            chunks(Iterator[pd.DataFrame]): The chunks of documents to process.
+
+        Returns:
+            List[str]: List of paths to the partial indices.
+        """
+        if self.max_workers > 1:
+            return self._write_partial_indices_parallel(chunks)
+
         partial_indices_paths: List[str] = []
 
-        # Iterate through chunks
-        for chunk in self.collection_loader.process_chunks(static_chunk_size):
-            # Process and save the chunk
-            index_path = self.resources_path + f"Compressed_Index_{len(partial_indices_paths) + 1}.vb"
-            chunk_index = self.process_chunk(chunk)
-            chunk_index.write_index_compressed_to_file(index_path)
-            partial_indices_paths.append(index_path)
-
-            # Clean up memory after processing the chunk
-            del chunk
-            del chunk_index
-            gc.collect()
+        # The indices of flush_every consecutive chunks are buffered into a single partial index, which is
+        # written by a background thread while the next chunks are processed
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as writer:
+            pending_writes = deque()
+            buffered_index = InvertedIndex()
+            buffered_chunks = 0
+
+            # Iterate through chunks
+            for chunk in chunks:
+                # At most one write may still be running while the chunk is processed,
+                # to bound the indices held in memory
+                while len(pending_writes) > 1:
+                    pending_writes.popleft().result()
+
+                buffered_index.merge(self.process_chunk(chunk))
+                buffered_chunks += 1
+
+                if buffered_chunks == self.flush_every:
+                    index_path, pending_write = self._save_partial_index(
+                        buffered_index, len(partial_indices_paths) + 1, writer
+                    )
+                    pending_writes.append(pending_write)
+                    partial_indices_paths.append(index_path)
+                    buffered_index = InvertedIndex()
+                    buffered_chunks = 0
+
+                # Clean up memory after processing the chunk
+                del chunk
+
+            # Flush the last, partially filled buffer
+            if buffered_chunks:
+                index_path, pending_write = self._save_partial_index(
+                    buffered_index, len(partial_indices_paths) + 1, writer
+                )
+                pending_writes.append(pending_write)
+                partial_indices_paths.append(index_path)
+
+            # Surface any error raised by the last writes
+            for pending_write in pending_writes:
+                pending_write.result()
 
         return partial_indices_paths
 
+    def _write_partial_indices_parallel(self, chunks: Iterator[pd.DataFrame]) -> List[str]:
+        """
+        Process the chunks in a pool of worker processes. Every worker saves its own partial index
+        and sends back the lexicon and document table of its chunk, merged here in chunk order.
+        At most max_workers + 2 chunks are resident at any time.
+
+        Args:
+            chunks(Iterator[pd.DataFrame]): The chunks of documents to process.
+
+        Returns:
+            List[str]: List of paths to the partial indices.
+        """
+        partial_indices_paths: List[str] = []
+        in_flight = deque()
+        # Bound the chunks read but not yet processed, so that the reader cannot run ahead of the workers
+        max_in_flight = self.max_workers + 2
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for chunk in chunks:
+                if len(in_flight) >= max_in_flight:
+                    self._merge_worker_structures(in_flight.popleft())
+
+                index_path = self._partial_index_path(len(partial_indices_paths) + 1)
+                in_flight.append(executor.submit(_process_and_save_chunk_worker, self.preprocessing, chunk, index_path))
+                partial_indices_paths.append(index_path)
+                del chunk
+
+            while in_flight:
+                self._merge_worker_structures(in_flight.popleft())
+
+        return partial_indices_paths
+
+    def _merge_worker_structures(self, future: concurrent.futures.Future) -> None:
+        """
+        Wait for a worker to process its chunk, then merge the lexicon and the document table it sent back.
+
+        Args:
+            future(concurrent.futures.Future): The future of the worker processing the chunk.
+        """
+        chunk_lexicon, chunk_document_table = future.result()
+        self.lexicon.merge(chunk_lexicon)
+        chunk_documents = chunk_document_table.get_all_documents()
+        self.document_table.add_documents_bulk(chunk_documents.keys(), chunk_documents.values())
+
     @staticmethod
     def _delete_partial_indices(partial_indices_paths: List[str]) -> None:
         """
-        Clean up intermediate index files.
+        Clean up intermediate index files that are still on disk, removing them in parallel.
 
         Args:
             partial_indices_paths(List[str]): The list of paths to the partial indexes to delete.
         """
-        for path in partial_indices_paths:
-            os.remove(path)
-            print(f"Deleted intermediate index file: {path}")
+        remaining_paths = [path for path in partial_indices_paths if os.path.exists(path)]
+        if remaining_paths:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(4, len(remaining_paths))) as executor:
+                list(executor.map(os.remove, remaining_paths))
+
+        print(f"Deleted {len(partial_indices_paths)} intermediate index files.")
 
     def get_index(self) -> CompressedInvertedIndex:
         """
-        Getter for the built compressed inverted index.
+        Getter for the built compressed inverted index. After a full build, the index is memory mapped from
+        the final index file.
         """
         return self.compressed_inverted_index
 
@@ -347,3 +589,29 @@ class InvertedIndexBuilder:
         Getter for the built document table.
         """
         return self.document_table
+
+
+def _process_and_save_chunk_worker(preprocessing: Preprocessing, chunk: pd.DataFrame, index_path: str) -> \
+        Tuple[Lexicon, DocumentTable]:
+    """
+    Worker process entry point: process a chunk and save its partial compressed index.
+
+    Args:
+        preprocessing(Preprocessing): Text preprocessing utilities.
+        chunk(pd.DataFrame): Chunk of documents to process.
+        index_path(str): The path where to save the partial compressed index.
+
+    Returns:
+        Tuple[Lexicon, DocumentTable]: The lexicon and the document table of the chunk.
+    """
+    builder = InvertedIndexBuilder(
+        collection_loader=None,
+        preprocessing=preprocessing,
+        merger=None,
+        lexicon=Lexicon(),
+        document_table=DocumentTable(),
+    )
+    # The chunks are already processed in parallel: a nested preprocessing pool in every worker would
+    # oversubscribe the cores and hold a copy of the chunk per process
+    builder.process_chunk(chunk, n_process=1).write_index_compressed_to_file(index_path)
+    return builder.get_lexicon(), builder.get_document_table()
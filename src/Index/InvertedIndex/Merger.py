@@ -1,8 +1,11 @@
-import concurrent.futures
-from collections import defaultdict
-from typing import List
+import heapq
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex
+import numpy as np
+
+from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex, WRITE_BUFFER_SIZE
 from Utils.CompressionTools import CompressionTools
 
 
@@ -28,27 +31,136 @@ class Merger:
         if not postings2:
             return postings1
 
-        # Decompress both postings lists (list of (doc_id, frequency) tuples)
-        doc_ids1, frequencies1 = CompressionTools.p_for_delta_decompress(postings1)
-        doc_ids2, frequencies2 = CompressionTools.p_for_delta_decompress(postings2)
+        return Merger._merge_many_compressed_postings([postings1, postings2])
+
+    @staticmethod
+    def _merge_posting_arrays(doc_ids1: np.ndarray, frequencies1: np.ndarray,
+                              doc_ids2: np.ndarray, frequencies2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Linearly merge two sorted lists of postings given as parallel arrays, summing frequencies for common doc_ids.
+
+        Args:
+            doc_ids1(np.ndarray): The sorted doc_ids of the first list.
+            frequencies1(np.ndarray): The frequencies of the first list.
+            doc_ids2(np.ndarray): The sorted doc_ids of the second list.
+            frequencies2(np.ndarray): The frequencies of the second list.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The merged doc_ids and frequencies.
+        """
+        # Both lists are already sorted: locate every posting of the second list in the first one
+        insert_positions = np.searchsorted(doc_ids1, doc_ids2)
 
-        # Merging: use a default dictionary to sum frequencies for the same doc_id
-        merged_frequencies = defaultdict(int)
+        # Documents in both lists get their frequencies summed in place (each doc_id appears once per list)
+        common = insert_positions < len(doc_ids1)
+        common[common] = doc_ids1[insert_positions[common]] == doc_ids2[common]
+        merged_frequencies = frequencies1.copy()
+        merged_frequencies[insert_positions[common]] += frequencies2[common]
 
-        # Add frequencies from the first posting list
-        for doc_id, freq in zip(doc_ids1, frequencies1):
-            merged_frequencies[doc_id] += freq
+        # The other postings of the second list are inserted at their sorted position
+        new = ~common
+        merged_doc_ids = np.insert(doc_ids1, insert_positions[new], doc_ids2[new])
+        merged_frequencies = np.insert(merged_frequencies, insert_positions[new], frequencies2[new])
+        return merged_doc_ids, merged_frequencies
 
-        # Add frequencies from the second posting list
-        for doc_id, freq in zip(doc_ids2, frequencies2):
-            merged_frequencies[doc_id] += freq
+    @staticmethod
+    def _merge_many_compressed_postings(postings_lists: List[bytes]) -> bytes:
+        """
+        Merge any number of lists of compressed postings of the same term, summing frequencies for common doc_ids.
 
-        # Convert the merged dictionary back to sorted lists of doc_ids and frequencies
-        merged_doc_ids = sorted(merged_frequencies.keys())
-        merged_frequencies_list = [merged_frequencies[doc_id] for doc_id in merged_doc_ids]
+        Args:
+            postings_lists(List[bytes]): The compressed lists of postings, in the order of their indices.
+
+        Returns:
+            bytes: The compressed list of merged postings.
+        """
+        # Empty lists are never written, so a term found in a single index is copied as it is
+        if len(postings_lists) == 1:
+            return postings_lists[0]
+
+        # Decompress all the lists at once into parallel arrays of doc_ids and frequencies
+        doc_ids, frequencies = CompressionTools.p_for_delta_decompress_many(postings_lists)
+
+        # Partial indices cover consecutive ranges of documents: their lists are usually just concatenated
+        if np.all(doc_ids[1:] > doc_ids[:-1]):
+            return CompressionTools.p_for_delta_compress(doc_ids, frequencies)
+
+        # Otherwise fold the sorted lists one by one into the merged one
+        boundaries = np.cumsum([CompressionTools.p_for_delta_count(postings) for postings in postings_lists])
+        merged_doc_ids, merged_frequencies = doc_ids[:boundaries[0]], frequencies[:boundaries[0]]
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            merged_doc_ids, merged_frequencies = Merger._merge_posting_arrays(
+                merged_doc_ids, merged_frequencies, doc_ids[start:end], frequencies[start:end])
 
         # Compress the merged lists and return the result
-        return CompressionTools.p_for_delta_compress(merged_doc_ids, merged_frequencies_list)
+        return CompressionTools.p_for_delta_compress(merged_doc_ids, merged_frequencies)
+
+    @staticmethod
+    def _merge_sorted_streams(streams: List[Iterator[Tuple[str, bytes]]]) -> Iterator[Tuple[str, bytes]]:
+        """
+        Merge streams of (term, compressed postings) sorted by term in a single pass, with a min-heap
+        holding the current entry of each stream.
+
+        Args:
+            streams(List[Iterator[Tuple[str, bytes]]]): The streams to merge, each one sorted by term.
+
+        Yields:
+            Tuple[str, bytes]: Every term, in sorted order, with its merged compressed postings.
+        """
+        # Entries with the same term are popped in the order of their streams
+        for term, entries in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+            yield term, Merger._merge_many_compressed_postings([postings for _, postings in entries])
+
+    @staticmethod
+    def _stream_index_file(path: str, on_consumed: Optional[Callable[[str], None]] = None) \
+            -> Iterator[Tuple[str, bytes]]:
+        """
+        Stream the entries of an index file, checking that its terms are sorted.
+
+        Args:
+            path(str): The path of the index file.
+            on_consumed(Optional[Callable[[str], None]]): Optional callback invoked with the path once the file
+            has been read entirely.
+
+        Yields:
+            Tuple[str, bytes]: A term and its compressed postings.
+        """
+        previous_term = None
+        for term, postings in CompressedInvertedIndex.iter_compressed_index_file(path):
+            if previous_term is not None and term <= previous_term:
+                raise ValueError(f"Terms of the index {path} are not sorted.")
+            previous_term = term
+            yield term, postings
+
+        if on_consumed is not None:
+            on_consumed(path)
+
+    def merge_compressed_index_files(self, index_paths: List[str], output_path: str,
+                                     on_consumed: Optional[Callable[[str], None]] = None) -> int:
+        """
+        Merge compressed index files sorted by term with a k-way streaming merge, writing the final index
+        straight to disk. Only the current entry of every file is held in memory.
+
+        Args:
+            index_paths(List[str]): List of paths of the indexes to merge, sorted by term.
+            output_path(str): The path where to write the merged index.
+            on_consumed(Optional[Callable[[str], None]]): Optional callback invoked with each path as soon as
+            its index has been read entirely, so that the caller can release the file early.
+
+        Returns:
+            int: The number of terms of the merged index.
+        """
+        if not index_paths:
+            raise ValueError("The list of index paths is empty.")
+
+        streams = [self._stream_index_file(path, on_consumed) for path in index_paths]
+        num_terms = 0
+        with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            for term, merged_postings in self._merge_sorted_streams(streams):
+                CompressedInvertedIndex.write_entry(f, term, merged_postings)
+                num_terms += 1
+
+        return num_terms
 
     def _merge_two_indices(self, index1: CompressedInvertedIndex,
                            index2: CompressedInvertedIndex) -> CompressedInvertedIndex:
@@ -63,23 +175,38 @@ class Merger:
             CompressedInvertedIndex: Merged compressed inverted index.
         """
         merged_index = CompressedInvertedIndex()
-        all_terms = set(index1.get_terms()).union(index2.get_terms())
 
-        for term in all_terms:
-            postings1 = index1.get_compressed_postings(term)
-            postings2 = index2.get_compressed_postings(term)
-            merged_postings = self._merge_compressed_postings(postings1, postings2)
-            if merged_postings:
-                merged_index.add_compressed_postings(term, merged_postings)
+        # Walk both term lists in sorted order, instead of building their union
+        for term, merged_postings in self._merge_sorted_streams([self._sorted_entries(index1),
+                                                                 self._sorted_entries(index2)]):
+            merged_index.add_compressed_postings(term, merged_postings)
 
         return merged_index
 
-    def merge_multiple_compressed_indices(self, index_paths: List[str]) -> CompressedInvertedIndex:
+    @staticmethod
+    def _sorted_entries(index: CompressedInvertedIndex) -> Iterator[Tuple[str, bytes]]:
         """
-        Merge an arbitrary number of compressed indices using parallel merging. Actual final merge.
+        Stream the entries of an in-memory compressed index sorted by term.
+
+        Args:
+            index(CompressedInvertedIndex): The compressed index.
+
+        Yields:
+            Tuple[str, bytes]: A term and its compressed postings.
+        """
+        for term in sorted(index.get_terms()):
+            yield term, index.get_compressed_postings(term)
+
+    def merge_multiple_compressed_indices(self, index_paths: List[str],
+                                          on_consumed: Optional[Callable[[str], None]] = None) \
+            -> CompressedInvertedIndex:
+        """
+        Merge an arbitrary number of compressed indices into memory, in a single k-way pass over their terms.
 
         Args:
             index_paths(List[str]): List of paths of the indexes to merge.
+            on_consumed(Optional[Callable[[str], None]]): Optional callback invoked with each path as soon as
+            its index has been loaded, so that the caller can release the file early.
 
         Returns:
             CompressedInvertedIndex: Final compressed inverted index.
@@ -87,30 +214,15 @@ class Merger:
         if not index_paths:
             raise ValueError("The list of index paths is empty.")
 
-        # Load all indices into memory
-        indices = [CompressedInvertedIndex.load_compressed_index_to_memory(path) for path in index_paths]
-
-        # Keep merging until there is only one index left
-        while len(indices) > 1:
-            merged_results = []
-
-            # Parallel processing
-            with concurrent.futures.ProcessPoolExecutor() as executor:
-                futures = []
-                for i in range(0, len(indices) - 1, 2):
-                    # Schedule merging of index pairs
-                    futures.append(executor.submit(self._merge_two_indices, indices[i], indices[i + 1]))
-
-                # Collect the merged results
-                for future in concurrent.futures.as_completed(futures):
-                    merged_results.append(future.result())
-
-            # If there is an odd number of indices, add the last one to the results
-            if len(indices) % 2 == 1:
-                merged_results.append(indices[-1])
+        # Load all indices into memory, streaming their entries sorted by term
+        streams = []
+        for path in index_paths:
+            streams.append(self._sorted_entries(CompressedInvertedIndex.load_compressed_index_to_memory(path)))
+            if on_consumed is not None:
+                on_consumed(path)
 
-            # Update the indices list with the merged results
-            indices = merged_results
+        final_index = CompressedInvertedIndex()
+        for term, merged_postings in self._merge_sorted_streams(streams):
+            final_index.add_compressed_postings(term, merged_postings)
 
-        # Return the final merged index
-        return indices[0]
+        return final_index
@@ -0,0 +1,148 @@
+from typing import Optional
+
+import numpy as np
+
+from Index.InvertedIndex.Posting import Posting
+from Utils.CompressionTools import BLOCK_SIZE, CompressionTools
+
+# Size of the first window searched by next_geq after the current posting, doubled at each miss
+GALLOP_INITIAL_STEP = 4
+
+
+class PostingList:
+    def __init__(self, compressed_postings: bytes):
+        """
+        Cursor over the postings of a term, moving forward in doc_id order. The compressed postings are
+        decoded on first access, in a single vectorized call, into contiguous NumPy arrays.
+
+        Args:
+            compressed_postings(bytes): The compressed postings of the term.
+        """
+        self._compressed_postings = compressed_postings
+        self._doc_ids = None
+        self._frequencies = None
+        # Last doc_id of every full block of postings, to locate far targets without searching the whole list
+        self._block_ends = None
+        # Position of the cursor in the decoded arrays
+        self.current_posting_index = 0
+        # Posting returned by the cursor, updated in place at every move
+        self._scratch_posting = Posting(0, 0)
+
+    def _decompress(self) -> None:
+        """
+        Decode the compressed postings into sorted int64 doc_ids and frequencies, if not already done.
+        """
+        if self._doc_ids is None:
+            doc_ids, frequencies = CompressionTools.p_for_delta_decompress_arrays(self._compressed_postings)
+            self._doc_ids = np.ascontiguousarray(doc_ids, dtype=np.int64)
+            self._frequencies = np.ascontiguousarray(frequencies, dtype=np.int64)
+        if self._block_ends is None:
+            self._block_ends = np.ascontiguousarray(self._doc_ids[BLOCK_SIZE - 1::BLOCK_SIZE])
+
+    @staticmethod
+    def from_arrays(doc_ids: np.ndarray, frequencies: np.ndarray) -> 'PostingList':
+        """
+        Builds a cursor over postings that are already decoded, without copying them.
+
+        Args:
+            doc_ids(np.ndarray): The sorted doc_ids.
+            frequencies(np.ndarray): The frequencies, parallel to the doc_ids.
+
+        Returns:
+            PostingList: The cursor over the postings.
+        """
+        posting_list = PostingList(b"")
+        posting_list._doc_ids = np.ascontiguousarray(doc_ids, dtype=np.int64)
+        posting_list._frequencies = np.ascontiguousarray(frequencies, dtype=np.int64)
+        return posting_list
+
+    def __len__(self) -> int:
+        """
+        Number of postings of the list, read from the header of the compressed postings if they are not decoded.
+        """
+        if self._doc_ids is not None:
+            return len(self._doc_ids)
+        return CompressionTools.p_for_delta_count(self._compressed_postings)
+
+    @property
+    def doc_ids(self) -> np.ndarray:
+        """
+        The sorted doc_ids of the list.
+        """
+        self._decompress()
+        return self._doc_ids
+
+    @property
+    def frequencies(self) -> np.ndarray:
+        """
+        The frequencies of the list, parallel to the doc_ids.
+        """
+        self._decompress()
+        return self._frequencies
+
+    def current(self) -> Optional[Posting]:
+        """
+        Returns the posting under the cursor. The same Posting object is updated in place at every move of
+        the cursor, so callers must copy its fields if they need them after the next move.
+
+        Returns:
+            Optional[Posting]: The current posting, or None if the list is exhausted.
+        """
+        self._decompress()
+        index = self.current_posting_index
+        if index >= len(self._doc_ids):
+            return None
+        posting = self._scratch_posting
+        posting.doc_id = int(self._doc_ids[index])
+        posting.payload = int(self._frequencies[index])
+        return posting
+
+    def next(self) -> Optional[Posting]:
+        """
+        Moves the cursor to the next posting.
+
+        Returns:
+            Optional[Posting]: The next posting, or None if the list is exhausted.
+        """
+        self.current_posting_index += 1
+        return self.current()
+
+    def next_geq(self, target_doc_id: int) -> Optional[Posting]:
+        """
+        Moves the cursor forward to the first posting with a doc_id greater than or equal to the target.
+        The cursor never moves backward: a target behind it returns the current posting.
+
+        Args:
+            target_doc_id(int): The doc_id to reach.
+
+        Returns:
+            Optional[Posting]: The posting reached, or None if no posting is left with such a doc_id.
+        """
+        self._decompress()
+        doc_ids = self._doc_ids
+        start = self.current_posting_index
+        if start >= len(doc_ids) or doc_ids[start] >= target_doc_id:
+            return self.current()
+
+        current_block = start // BLOCK_SIZE
+        block_end = min((current_block + 1) * BLOCK_SIZE, len(doc_ids))
+        if doc_ids[block_end - 1] < target_doc_id:
+            # The target is past the block of the cursor: the last doc_ids of the blocks act as skip pointers,
+            # and one binary search over the ones ahead of the cursor finds the block holding the target
+            block = current_block + 1 + int(
+                np.searchsorted(self._block_ends[current_block + 1:], target_doc_id, side='left'))
+            low = block * BLOCK_SIZE
+            high = min(low + BLOCK_SIZE, len(doc_ids))
+        else:
+            # Successive targets are usually close to the cursor: gallop over windows of growing size
+            # inside the block
+            low, step = start + 1, GALLOP_INITIAL_STEP
+            high = start + step
+            while high < block_end and doc_ids[high] < target_doc_id:
+                low, step = high + 1, step * 2
+                high = start + step
+            high = min(high, block_end)
+
+        # Binary search in C inside the window holding the target
+        self.current_posting_index = low + int(np.searchsorted(doc_ids[low:high], target_doc_id, side='left'))
+        return self.current()
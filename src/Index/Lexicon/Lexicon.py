@@ -1,5 +1,9 @@
 # Lexicon structure class
-from typing import List
+import csv
+import os
+from typing import Iterable, List
+
+import pandas as pd
 
 
 class Lexicon:
@@ -18,6 +22,28 @@ class Lexicon:
         """
         self._lexicon[term] = self._lexicon.get(term, 0) + document_frequency
 
+    def add_terms_bulk(self, terms: Iterable[str], document_frequencies: Iterable[int]) -> None:
+        """
+        Adds or updates several terms at once, summing their document frequencies to the current ones.
+
+        Args:
+            terms (Iterable[str]): The terms to add.
+            document_frequencies (Iterable[int]): The number of documents each term appears in.
+        """
+        lexicon = self._lexicon
+        get = lexicon.get
+        for term, document_frequency in zip(terms, document_frequencies):
+            lexicon[term] = get(term, 0) + document_frequency
+
+    def merge(self, other: 'Lexicon') -> None:
+        """
+        Adds all the terms of another lexicon, summing the document frequencies of the shared terms.
+
+        Args:
+            other (Lexicon): The lexicon to merge into this one.
+        """
+        self.add_terms_bulk(other._lexicon.keys(), other._lexicon.values())
+
     def get_term_info(self, term: str) -> int:
         """
         Retrieves document frequency for a given term.
@@ -62,8 +88,13 @@ class Lexicon:
             Lexicon: The loaded Lexicon object.
         """
         lexicon = Lexicon()
-        with open(filepath, "r") as f:
-            for line in f:
-                term, document_frequency = line.strip().split()
-                lexicon.add_term(term, int(document_frequency))
+        if os.path.getsize(filepath) == 0:
+            return lexicon
+
+        # Parse the whole file with the C tokenizer of pandas. Terms are read verbatim: no quoting and no
+        # missing values, so that terms such as "nan" or "null" stay strings
+        table = pd.read_csv(filepath, sep=" ", header=None, names=["term", "document_frequency"],
+                            dtype={"term": str, "document_frequency": "int64"}, engine="c",
+                            quoting=csv.QUOTE_NONE, na_filter=False)
+        lexicon.add_terms_bulk(table["term"].tolist(), table["document_frequency"].tolist())
         return lexicon
@@ -1,3 +1,4 @@
+import argparse
 import time
 
 from Index.DocumentTable.DocumentTable import DocumentTable
@@ -9,9 +10,15 @@ from Utils.Preprocessing import Preprocessing
 
 
 class IndexBuilderMain:
-    def __init__(self):
+    def __init__(self, max_workers: int = 1, flush_every: int = 1):
         """
         Initializes all required components for index building.
+
+        Args:
+            max_workers(int): Number of worker processes building partial indices in parallel. Default is 1,
+            which processes the chunks sequentially.
+            flush_every(int): Number of consecutive chunks buffered into a single partial index, when processing
+            sequentially. Default is 1.
         """
         # Initialize components
         self.collection_loader = CollectionLoader()
@@ -26,7 +33,9 @@ class IndexBuilderMain:
             preprocessing=self.preprocessing,
             merger=self.merger,
             document_table=self.document_table,
-            lexicon=self.lexicon
+            lexicon=self.lexicon,
+            max_workers=max_workers,
+            flush_every=flush_every
         )
 
     def build_index(self) -> None:
@@ -54,5 +63,13 @@ class IndexBuilderMain:
 
 
 if __name__ == "__main__":
-    builder = IndexBuilderMain()
+    parser = argparse.ArgumentParser(description="Build the inverted index, lexicon and document table.")
+    parser.add_argument("--max-workers", type=int, default=1,
+                        help="Number of worker processes building partial indices in parallel. Default is 1.")
+    parser.add_argument("--flush-every", type=int, default=1,
+                        help="Number of consecutive chunks buffered into a single partial index, when processing "
+                             "sequentially. Default is 1.")
+    args = parser.parse_args()
+
+    builder = IndexBuilderMain(max_workers=args.max_workers, flush_every=args.flush_every)
     builder.build_index()
\ No newline at end of file
@@ -1,7 +1,11 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 
 from Utils.Preprocessing import Preprocessing
 
+# Number of parsed queries kept in memory, so that repeated queries skip the preprocessing
+PARSE_CACHE_SIZE = 4096
+
 
 class QueryParser:
     def __init__(self, preprocessing: Preprocessing):
@@ -12,6 +16,24 @@ class QueryParser:
             preprocessing: An instance of the Preprocessing class for text preprocessing.
         """
         self.preprocessing = preprocessing
+        self._preprocess_cached = lru_cache(maxsize=PARSE_CACHE_SIZE)(self._preprocess)
+
+    def _preprocess(self, query: str, stopwords_flag: bool, stem_flag: bool, min_word_length: int) \
+            -> Tuple[str, ...]:
+        """
+        Preprocesses a query. The preprocessing settings are part of the arguments only to key the cache,
+        so that a change of settings never returns tokens cached with the previous ones.
+
+        Args:
+            query(str): The query string.
+            stopwords_flag(bool): The stopwords removal setting of the preprocessing.
+            stem_flag(bool): The stemming setting of the preprocessing.
+            min_word_length(int): The minimum word length setting of the preprocessing.
+
+        Returns:
+            Tuple[str, ...]: The immutable tuple of query terms.
+        """
+        return tuple(self.preprocessing.single_text_preprocess(query))
 
     def parse(self, query: str) -> List[str]:
         """
@@ -26,7 +48,10 @@ class QueryParser:
         if not query:
             return []
 
-        # Preprocess the query: clean, tokenize, remove stopwords, and stem
-        tokens = self.preprocessing.single_text_preprocess(query)
+        # Preprocess the query: clean, tokenize, remove stopwords, and stem. Repeated queries are served
+        # from the cache
+        preprocessing = self.preprocessing
+        tokens = self._preprocess_cached(query, preprocessing.stopwords_flag, preprocessing.stem_flag,
+                                         preprocessing.min_word_length)
 
-        return tokens
+        return list(tokens)
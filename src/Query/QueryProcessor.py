@@ -1,13 +1,21 @@
-from collections import defaultdict
-from typing import List, Dict
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from Index.DocumentTable.DocumentTable import DocumentTable
 from Index.InvertedIndex.CompressedInvertedIndex import CompressedInvertedIndex
-from Index.InvertedIndex.Posting import Posting
 from Index.Lexicon.Lexicon import Lexicon
 from Query.QueryParser import QueryParser
 from Query.Scoring import Scoring
 
+# Share of the doc_id space that the postings of a disjunctive query must cover to accumulate the scores of
+# its documents in a dense vector indexed by doc_id, rather than in a sorted array of the matching documents
+DENSE_SCORES_MIN_FILL = 1 / 8
+
 
 class QueryProcessor:
     def __init__(self,
@@ -46,134 +54,245 @@ class QueryProcessor:
             Dict[int, float]: Dictionary with the first max_results ranked documents
             and their scores.
         """
+        if query_type not in ("conjunctive", "disjunctive"):
+            raise ValueError("Invalid query type. Choose 'conjunctive' or 'disjunctive'.")
+
         query_terms = self.query_parser.parse(query)
-        if not query_terms:
+        if not query_terms or max_results <= 0:
             return {}
 
-        # Get postings lists for each term with their associated term
-        term_postings = self.get_term_postings(query_terms)
+        # Terms missing from the lexicon have no postings: a conjunctive query cannot match any document,
+        # a disjunctive one just ignores them. Either way, their postings are never fetched
+        known_terms = [term for term in query_terms if self.lexicon.get_term_info(term)]
+        if not known_terms or (query_type == "conjunctive" and len(known_terms) < len(query_terms)):
+            return {}
+
+        # Each term counts once, whatever the number of its occurrences in the query
+        unique_terms = list(dict.fromkeys(known_terms))
 
         # Execute query based on type
         if query_type == "conjunctive":
-            matching_docs = self.execute_conjunctive_query(term_postings)
-        elif query_type == "disjunctive":
-            matching_docs = self.execute_disjunctive_query(term_postings)
-        else:
-            raise ValueError("Invalid query type. Choose 'conjunctive' or 'disjunctive'.")
+            # Postings are fetched lazily from the rarest term on, as known from the lexicon, so that the
+            # longest lists are not even decoded when the intersection becomes empty early: only the next list
+            # is decoded while the current one is intersected.
+            # Documents are scored while intersecting the lists, without building the matching postings
+            unique_terms.sort(key=self.lexicon.get_term_info)
+            return self.score_conjunctive_query(self.get_term_postings(unique_terms, decode_ahead=1),
+                                                method, max_results)
 
-        # Rank documents based on the chosen scoring method
-        ranked_documents = self.rank_documents(matching_docs, method)
+        # Every document of the lists matches: rank them based on the chosen scoring method,
+        # keeping the top 'max_results' ones. All the lists are needed, so they are decoded in parallel
+        return self.rank_documents(dict(self.get_term_postings(unique_terms)), method, max_results)
 
-        # Return the top 'max_results' documents
-        return dict(list(ranked_documents.items())[:max_results])
-
-    def get_term_postings(self, terms: List[str]) -> Dict[str, List[Posting]]:
+    def get_term_postings(self, terms: List[str], decode_ahead: Optional[int] = None) \
+            -> Iterator[Tuple[str, Tuple[np.ndarray, np.ndarray]]]:
         """
-        Get postings for each term while maintaining term association.
+        Get postings for each term while maintaining term association. The posting lists are decoded in a
+        thread pool, up to decode_ahead lists ahead of the one being consumed.
 
         Args:
             terms(List[str]): the list of query terms, already parsed.
+            decode_ahead(Optional[int]): Number of lists decoded ahead of the one being consumed. By default,
+            all the lists are decoded at once.
+
+        Yields:
+            Tuple[str, Tuple[np.ndarray, np.ndarray]]: A query term and its posting list, as sorted doc_ids
+            and frequencies, in the order of the terms.
+        """
+        if decode_ahead is None:
+            decode_ahead = len(terms)
+
+        pending = deque()
+        for term in terms:
+            pending.append((term, _get_decode_pool().submit(self.inverted_index.get_posting_arrays, term)))
+            if len(pending) > decode_ahead:
+                term, decoded = pending.popleft()
+                yield term, decoded.result()
+        while pending:
+            term, decoded = pending.popleft()
+            yield term, decoded.result()
+
+    def score_conjunctive_query(self, term_postings: Iterable[Tuple[str, Tuple[np.ndarray, np.ndarray]]],
+                                method: str, max_results: int = 10) -> Dict[int, float]:
+        """
+        The method to process and rank a conjunctive query. The posting lists are intersected in the
+        order they come, ideally from the shortest one, and consumed only while the intersection is not
+        empty. The documents matching all the query terms are then scored straight from the posting arrays.
+
+        Args:
+            term_postings(Iterable[Tuple[str, Tuple[np.ndarray, np.ndarray]]]): The query terms with their
+            postings, sorted by increasing document frequency.
+            method(str): TFIDF or BM25 scoring.
+            max_results(int): Number of results to return. Default is 10.
 
         Returns:
-            Dict[str, List[Posting]]: A dict of query terms and relative posting lists.
+            Dict[int, float]: A dict mapping the best max_results matching documents to their computed score,
+            in descending order of score.
         """
-        return {
-            term: list(self.inverted_index.get_uncompressed_postings(term))
-            for term in terms
-        }
+        matching_doc_ids = None
+        # Terms intersected so far, with their frequencies and the positions of the matching documents in their lists
+        intersected_postings = []
 
-    @staticmethod
-    def execute_conjunctive_query(term_postings: Dict[str, List[Posting]]) -> Dict[str, Dict[int, Posting]]:
+        # Intersect the posting lists: doc_ids are sorted and unique in every list
+        for term, (doc_ids, frequencies) in term_postings:
+            if matching_doc_ids is None:
+                matching_doc_ids = doc_ids
+                positions = np.arange(len(doc_ids))
+            else:
+                # The matching documents are at most as many as in the shortest list: gallop through the longer
+                # list with a binary search for each of them, instead of merging both lists
+                positions = np.searchsorted(doc_ids, matching_doc_ids)
+                found = positions < len(doc_ids)
+                found[found] = doc_ids[positions[found]] == matching_doc_ids[found]
+                matching_doc_ids, positions = matching_doc_ids[found], positions[found]
+                intersected_postings = [(term, frequencies, term_positions[found])
+                                        for term, frequencies, term_positions in intersected_postings]
+            if not len(matching_doc_ids):  # Early termination if no matches
+                return {}
+            intersected_postings.append((term, frequencies, positions))
+        if matching_doc_ids is None:
+            return {}
+
+        # Score the matching documents term by term, with their frequencies at the positions found
+        scores = np.zeros(len(matching_doc_ids))
+        for term, frequencies, positions in intersected_postings:
+            scores += self.scoring.compute_scores(term, matching_doc_ids, frequencies[positions], method)
+
+        return self._top_documents(matching_doc_ids, scores, max_results)
+
+    def rank_documents(self, term_postings: Dict[str, Tuple[np.ndarray, np.ndarray]], method: str,
+                       max_results: int = 10) -> Dict[int, float]:
         """
-        The method to process a conjunctive query. Starts with the shortest posting list
-        to optimize the intersection operation.
+        Function to pass the documents of the posting lists to the scoring method of choice, returning the best
+        documents matching at least 1 query term. Documents are ranked with MaxScore: terms are processed from
+        the one with the highest score upper bound, and as soon as the upper bounds of the remaining terms sum
+        to less than the score of the current max_results-th document, no new document can enter the results.
+        The remaining lists are then only searched for the documents already found, which are dropped as soon
+        as they cannot reach the results either. When the lists cover a good share of the collection, scores are
+        accumulated in a dense vector indexed by doc_id instead of a sorted array of the documents found.
 
         Args:
-            term_postings(Dict[str, List[Posting]]): The list of postings for the query terms.
+            term_postings(Dict[str, Tuple[np.ndarray, np.ndarray]]): The postings for the query terms.
+            method(str): TFIDF or BM25 scoring.
+            max_results(int): Number of results to return. Default is 10.
 
         Returns:
-            Dict[str, Dict[int, Posting]]: Dict of query terms associated with a dict of doc_ids
-            and postings. Only the documents matching all the query terms are kept. The structure is
-            useful for scoring.
+            Dict[int, float]: A dict mapping the best max_results documents to their computed score,
+            in descending order of score.
         """
-        if not term_postings:
+        # Terms without postings have nothing to score. The others come with the upper bound of their score
+        terms = [(term, doc_ids, frequencies, self.scoring.compute_max_score(term, doc_ids, frequencies, method))
+                 for term, (doc_ids, frequencies) in term_postings.items() if len(doc_ids)]
+        if not terms:
             return {}
+        terms.sort(key=lambda item: item[3], reverse=True)
+        # Upper bound of the score a document can still gain from each term on
+        remaining_bounds = np.cumsum([max_score for *_, max_score in terms][::-1])[::-1].tolist()
 
-        # Get the shortest posting list first to minimize intersection operations
-        sorted_terms = sorted(term_postings.items(), key=lambda x: len(x[1]))
-        first_term, first_postings = sorted_terms[0]
+        # Large queries accumulate their scores in a dense vector, small ones in a sorted array of candidates
+        doc_id_space = max(int(doc_ids[-1]) for _, doc_ids, _, _ in terms) + 1
+        dense = sum(len(doc_ids) for _, doc_ids, _, _ in terms) >= DENSE_SCORES_MIN_FILL * doc_id_space
+        if dense:
+            scores = np.zeros(doc_id_space)
+            seen = np.zeros(doc_id_space, dtype=bool)
+        candidate_doc_ids = np.empty(0, dtype=np.int64)
+        candidate_scores = np.empty(0, dtype=np.float64)
 
-        # Initialize with the shortest posting list
-        matching_doc_ids = {posting.doc_id for posting in first_postings}
+        # While new documents may still enter the results, the whole list of each term is scored
+        threshold = -np.inf
+        essential_terms = 0
+        while essential_terms < len(terms) and remaining_bounds[essential_terms] >= threshold:
+            term, doc_ids, frequencies, _ = terms[essential_terms]
+            term_scores = self.scoring.compute_scores(term, doc_ids, frequencies, method)
+            if dense:
+                # doc_ids are unique in a list, so the scores can be added with a single scatter
+                scores[doc_ids] += term_scores
+                seen[doc_ids] = True
+                if np.count_nonzero(seen) >= max_results:
+                    # Scores are never negative, so unseen documents do not change the max_results-th score
+                    threshold = self._max_results_th_score(scores, max_results)
+            else:
+                # Add the list to the candidates, summing the scores of the documents found in several lists
+                all_doc_ids = np.concatenate((candidate_doc_ids, doc_ids))
+                all_scores = np.concatenate((candidate_scores, term_scores))
+                candidate_doc_ids, positions = np.unique(all_doc_ids, return_inverse=True)
+                candidate_scores = np.bincount(positions, weights=all_scores, minlength=len(candidate_doc_ids))
+                if len(candidate_doc_ids) >= max_results:
+                    threshold = self._max_results_th_score(candidate_scores, max_results)
+            essential_terms += 1
 
-        # Intersect with remaining posting lists
-        for term, postings in sorted_terms[1:]:
-            posting_doc_ids = {posting.doc_id for posting in postings}
-            matching_doc_ids &= posting_doc_ids
-            if not matching_doc_ids:  # Early termination if no matches
-                return {}
+        if dense:
+            candidate_doc_ids = np.flatnonzero(seen)
+            candidate_scores = scores[candidate_doc_ids]
+
+        # Only the candidates can still enter the results: search them in the remaining sorted lists
+        for (term, doc_ids, frequencies, _), remaining_bound in zip(terms[essential_terms:],
+                                                                    remaining_bounds[essential_terms:]):
+            # Candidates that cannot reach the threshold even with the remaining terms are dropped
+            threshold = self._max_results_th_score(candidate_scores, max_results)
+            reachable = candidate_scores + remaining_bound >= threshold
+            candidate_doc_ids, candidate_scores = candidate_doc_ids[reachable], candidate_scores[reachable]
 
-        # Create result dictionary only for matching documents
-        return {
-            term: {
-                posting.doc_id: posting
-                for posting in postings
-                if posting.doc_id in matching_doc_ids
-            }
-            for term, postings in term_postings.items()
-        }
+            positions = np.searchsorted(doc_ids, candidate_doc_ids)
+            found = positions < len(doc_ids)
+            found[found] = doc_ids[positions[found]] == candidate_doc_ids[found]
+            candidate_scores[found] += self.scoring.compute_scores(
+                term, candidate_doc_ids[found], frequencies[positions[found]], method)
+
+        return self._top_documents(candidate_doc_ids, candidate_scores, max_results)
 
     @staticmethod
-    def execute_disjunctive_query(term_postings: Dict[str, List[Posting]]) -> Dict[str, Dict[int, Posting]]:
+    def _max_results_th_score(scores: np.ndarray, max_results: int) -> float:
         """
-        Execute disjunctive query returning matching documents with their postings per term.
+        Selects the max_results-th best score, in linear time.
 
         Args:
-            term_postings(Dict[str, List[Posting]]): The list of postings for the query terms.
+            scores(np.ndarray): The scores, at least max_results.
+            max_results(int): Number of results to return.
 
         Returns:
-            Dict[str, Dict[int, Posting]]: Dict of query terms associated with a dict of doc_ids
-            and postings. All the documents matching at least 1 query term are kept. The structure is
-            useful for scoring.
+            float: The max_results-th best score.
         """
-        return {
-            term: {posting.doc_id: posting for posting in postings}
-            for term, postings in term_postings.items()
-        }
+        return float(np.partition(scores, len(scores) - max_results)[len(scores) - max_results])
 
-    def rank_documents(self, term_postings: Dict[str, Dict[int, Posting]], method: str) -> Dict[int, float]:
+    @staticmethod
+    def _top_documents(doc_ids: np.ndarray, scores: np.ndarray, max_results: int) -> Dict[int, float]:
         """
-        Function to pass the documents selected by the query parser ones to the scoring method
-        of choice.
+        Selects the documents with the best scores.
 
         Args:
-            term_postings(Dict[str, Dict[int, Posting]]): The documents selected for the query.
-            method(str): TFIDF or BM25 scoring.
+            doc_ids(np.ndarray): The scored documents.
+            scores(np.ndarray): The score of each document.
+            max_results(int): Number of results to return.
 
         Returns:
-            Dict[int, float]: A dict mapping the input documents to their computed score.
+            Dict[int, float]: A dict mapping the best max_results documents to their score,
+            in descending order of score.
         """
-        scores = defaultdict(float)
-
-        # Get all unique document IDs
-        all_doc_ids = {
-            doc_id
-            for postings_map in term_postings.values()
-            for doc_id in postings_map.keys()
-        }
-
-        # For each document, compute its score
-        for doc_id in all_doc_ids:
-            doc_score = 0
-            matched_terms = 0
-            for term, postings_map in term_postings.items():
-                if doc_id in postings_map:
-                    # Only compute score if the term appears in the document (not granted for disjunctive case)
-                    posting = postings_map[doc_id]
-                    doc_score += self.scoring.compute_score(term, doc_id, posting.payload, method)
-                    matched_terms += 1
-
-            scores[doc_id] = doc_score
-
-        # Rank the documents by their score in descending order
-        return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+        # Select the best max_results documents in linear time, then rank them by their score in descending
+        # order, and by doc_id between equal scores
+        if len(scores) > max_results:
+            best = np.argpartition(scores, len(scores) - max_results)[len(scores) - max_results:]
+            doc_ids, scores = doc_ids[best], scores[best]
+        order = np.lexsort((doc_ids, -scores))
+        return dict(zip(doc_ids[order].tolist(), scores[order].tolist()))
+
+
+# Threads decoding the posting lists of the query terms in parallel, shared by all the query processors and
+# created on first use: NumPy releases the GIL in its loops
+_decode_pool: Optional[ThreadPoolExecutor] = None
+_decode_pool_lock = Lock()
+
+
+def _get_decode_pool() -> ThreadPoolExecutor:
+    """
+    Get the thread pool decoding the posting lists, creating it the first time.
+
+    Returns:
+        ThreadPoolExecutor: The decoding thread pool, shared by all the query processors.
+    """
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _decode_pool
@@ -1,8 +1,14 @@
 import math
 
+import numpy as np
+
 from Index.DocumentTable.DocumentTable import DocumentTable
 from Index.Lexicon.Lexicon import Lexicon
 
+# Default BM25 parameters: term frequency saturation (usually in the range 1.2-2.0) and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
 
 class Scoring:
     def __init__(self, lexicon: Lexicon, document_table: DocumentTable):
@@ -16,7 +22,15 @@ class Scoring:
         self.lexicon = lexicon
         self.document_table = document_table
         self.total_documents = len(document_table.get_all_documents())
+        # Document lengths indexed by doc_id, to look up the lengths of many documents at once
+        self.doc_lengths = self._build_doc_lengths()
         self.avg_doc_length = self._calculate_avg_doc_length()
+        # Document side of the BM25 denominator with the default parameters, computed once for every document
+        self.bm25_length_norms = self._build_bm25_length_norms()
+        # Dict of term -> inverse document frequency, computed on first use
+        self._idfs = {}
+        # Dict of (term, method) -> highest score of the term in a document, computed on first use
+        self._max_scores = {}
 
     def _calculate_avg_doc_length(self) -> float:
         """
@@ -25,10 +39,74 @@ class Scoring:
         Returns:
             float: Average collection document length.
         """
-        total_length = sum(
-            self.document_table.get_document_length(doc_id) for doc_id in self.document_table.get_all_documents())
+        # Missing doc_ids have length zero in the array, so they do not change the sum
+        total_length = float(self.doc_lengths.sum())
         return total_length / self.total_documents if self.total_documents > 0 else 0
 
+    def _build_doc_lengths(self) -> np.ndarray:
+        """
+        Builds a dense array of document lengths indexed by doc_id, with 0 for missing doc_ids.
+
+        Returns:
+            np.ndarray: The float64 array of document lengths.
+        """
+        documents = self.document_table.get_all_documents()
+        doc_ids = np.fromiter(documents.keys(), dtype=np.int64, count=len(documents))
+        doc_lengths = np.zeros(doc_ids.max() + 1 if len(doc_ids) else 0, dtype=np.float64)
+        doc_lengths[doc_ids] = np.fromiter(documents.values(), dtype=np.float64, count=len(documents))
+        return doc_lengths
+
+    def _build_bm25_length_norms(self) -> np.ndarray:
+        """
+        Precomputes the length normalization k1 * (1 - b + b * length / average length) of every document, with
+        the default BM25 parameters. Empty or missing documents get an infinite normalization, so that their
+        BM25 scores are zero without checking their length.
+
+        Returns:
+            np.ndarray: The float64 array of length normalizations, indexed by doc_id.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            length_norms = BM25_K1 * (1 - BM25_B + BM25_B * (self.doc_lengths / self.avg_doc_length))
+        length_norms[self.doc_lengths == 0] = np.inf
+        return length_norms
+
+    @staticmethod
+    def _lookup_documents(values: np.ndarray, doc_ids: np.ndarray, missing_value: float) -> np.ndarray:
+        """
+        Looks up the values of many documents in an array indexed by doc_id. The doc_ids past the end of
+        the array, missing from the document table, get the missing value.
+
+        Args:
+            values(np.ndarray): The array indexed by doc_id.
+            doc_ids(np.ndarray): The document ids.
+            missing_value(float): The value of the documents missing from the array.
+
+        Returns:
+            np.ndarray: A new array with the values of the documents, parallel to the doc_ids.
+        """
+        doc_ids = np.asarray(doc_ids)
+        in_table = doc_ids < len(values)
+        if in_table.all():
+            return values[doc_ids]
+        document_values = np.full(len(doc_ids), missing_value, dtype=values.dtype)
+        document_values[in_table] = values[doc_ids[in_table]]
+        return document_values
+
+    def _get_idf(self, term: str) -> float:
+        """
+        Fetches the inverse document frequency of a term, computing it only the first time.
+
+        Args:
+            term(str): The query term.
+
+        Returns:
+            float: The IDF of the term.
+        """
+        idf = self._idfs.get(term)
+        if idf is None:
+            idf = self._idfs[term] = math.log(self.total_documents / (self.lexicon.get_term_info(term)))
+        return idf
+
     def compute_tfidf(self, term: str, payload: int) -> float:
         """
         Computes the TFIDF score for a given term in a document.
@@ -46,12 +124,12 @@ class Scoring:
         tf = 1 + math.log(term_frequency)
 
         # Compute inverse document frequency (IDF)
-        idf = math.log(self.total_documents / (self.lexicon.get_term_info(term)))
+        idf = self._get_idf(term)
 
         # TFIDF score is TF * IDF
         return tf * idf
 
-    def compute_bm25(self, term: str, doc_id: int, payload: int, k1: float = 1.5, b: float = 0.75) -> float:
+    def compute_bm25(self, term: str, doc_id: int, payload: int, k1: float = BM25_K1, b: float = BM25_B) -> float:
         """
         Computes the BM25 score for a given term in a document.
 
@@ -75,8 +153,7 @@ class Scoring:
 
         tf = payload
 
-        idf = math.log(
-            self.total_documents / (self.lexicon.get_term_info(term)))
+        idf = self._get_idf(term)
 
         # BM25 formula: idf * (numerator / denominator)
         numerator = tf
@@ -105,3 +182,68 @@ class Scoring:
         else:
             raise ValueError("Invalid scoring method. Choose 'tfidf' or 'bm25'")
         return score
+
+    def compute_scores(self, term: str, doc_ids: np.ndarray, payloads: np.ndarray, method: str = "tfidf",
+                       k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+        """
+        Computes the scores of a term for many documents at once, with the same formulas as compute_score.
+
+        Args:
+            term(str): Query term.
+            doc_ids(np.ndarray): The document ids.
+            payloads(np.ndarray): The frequency of the term in each document.
+            method(str): TFIDF of BM25. Default "tfidf".
+            k1(float): BM25 parameter. Default 1.5.
+            b(float): BM25 length normalization parameter. Default 0.75.
+
+        Returns:
+            np.ndarray: The float64 array of scores, parallel to the doc_ids.
+        """
+        if method not in ("tfidf", "bm25"):
+            raise ValueError("Invalid scoring method. Choose 'tfidf' or 'bm25'")
+        if not len(doc_ids):
+            return np.empty(0, dtype=np.float64)
+
+        idf = self._get_idf(term)
+        tf = np.asarray(payloads, dtype=np.float64)
+        # The formulas are evaluated in place in a single output buffer, without a temporary array per operation
+        if method == "tfidf":
+            scores = np.log(tf)
+            scores += 1
+            scores *= idf
+            return scores
+
+        if k1 == BM25_K1 and b == BM25_B:
+            # Documents of length zero, or missing from the document table, have an infinite normalization,
+            # so they score zero as in compute_bm25
+            scores = self._lookup_documents(self.bm25_length_norms, doc_ids, np.inf)
+            scores += tf
+            np.divide(tf, scores, out=scores)
+            scores *= idf
+            return scores
+
+        doc_lengths = self._lookup_documents(self.doc_lengths, doc_ids, 0.0)
+        denominator = tf + k1 * (1 - b + b * (doc_lengths / self.avg_doc_length))
+        # Documents of length zero, or missing from the document table, score zero as in compute_bm25
+        return np.where(doc_lengths == 0, 0.0, idf * (tf / denominator))
+
+    def compute_max_score(self, term: str, doc_ids: np.ndarray, payloads: np.ndarray, method: str = "tfidf") -> float:
+        """
+        Computes the highest score of a term in a document, the upper bound used to prune the documents
+        that cannot enter the results. The bound is computed once per term and method, over the whole posting
+        list of the term, and kept for the following queries.
+
+        Args:
+            term(str): Query term.
+            doc_ids(np.ndarray): The document ids of the whole posting list of the term.
+            payloads(np.ndarray): The frequency of the term in each document.
+            method(str): TFIDF of BM25. Default "tfidf".
+
+        Returns:
+            float: The highest score of the term.
+        """
+        max_score = self._max_scores.get((term, method))
+        if max_score is None:
+            scores = self.compute_scores(term, doc_ids, payloads, method)
+            max_score = self._max_scores[(term, method)] = float(scores.max()) if len(scores) else 0.0
+        return max_score
@@ -18,7 +18,7 @@ def load_resources():
     query_parser = QueryParser(Preprocessing())  # Using the Preprocessing class here
     lexicon = Lexicon.load_from_file(os.path.join(RESOURCES_PATH, "Lexicon"))
     document_table = DocumentTable.load_from_file(os.path.join(RESOURCES_PATH, "DocumentTable"))
-    inverted_index = CompressedInvertedIndex.load_compressed_index_to_memory(
+    inverted_index = CompressedInvertedIndex.load_compressed_index_mapped(
         os.path.join(RESOURCES_PATH, "InvertedIndex"))
     query_processor = QueryProcessor(query_parser, lexicon, document_table, inverted_index)
     print("Resources loaded successfully.")
@@ -62,7 +62,20 @@ def main():
     Runs the CLI loop where users can input queries.
     """
     query_processor = load_resources()
+    try:
+        run_loop(query_processor)
+    finally:
+        # Release the memory map of the inverted index
+        query_processor.inverted_index.close()
 
+
+def run_loop(query_processor) -> None:
+    """
+    Reads queries from the user and prints their results, until the user exits.
+
+    Args:
+        query_processor: The QueryProcessor instance to use
+    """
     while True:
         query = input("\nEnter query (or type 'exit' to quit): ").strip()
         if query.lower() == "exit":
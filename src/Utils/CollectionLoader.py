@@ -1,14 +1,30 @@
-import gzip
 import io
+import math
 import os
 import random
-import sys
-from typing import List, Iterator
+from contextlib import closing, contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
 
 import pandas as pd
 
 from Utils.config import RESOURCES_PATH
 
+try:
+    # ISA-L decompresses gzip streams several times faster than zlib, when the isal package is installed
+    from isal.igzip import IGzipFile as GzipFile
+except ImportError:
+    from gzip import GzipFile
+
+# Size of the buffer used to read the compressed collection from disk
+READ_BUFFER_SIZE = 1 << 20
+# Number of compressed bytes the kernel is asked to prefetch ahead of the current read position
+PREFETCH_SIZE = 64 << 20
+# Number of lines streamed between two prefetch requests
+PREFETCH_INTERVAL_LINES = 10000
+# Suffix of the file, next to the collection, caching its number of documents
+DOCS_COUNT_SUFFIX = ".count"
+
 
 class CollectionLoader:
     def __init__(self,
@@ -31,60 +47,165 @@ class CollectionLoader:
         self.column_names = column_names
         self._total_docs = None
 
+    @contextmanager
+    def _open_collection(self) -> Iterator[io.TextIOWrapper]:
+        """
+        Open the compressed collection for a sequential text read. The kernel is advised of the
+        sequential access pattern, so that it reads ahead aggressively, and the compressed file is
+        read through a large buffer.
+
+        Yields:
+            io.TextIOWrapper: The decompressed text stream of the collection.
+        """
+        with open(self.file_path, 'rb', buffering=READ_BUFFER_SIZE) as raw_file:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(raw_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            with io.TextIOWrapper(GzipFile(fileobj=raw_file, mode='rb'), encoding='utf-8') as file:
+                yield file
+
     def get_total_docs(self) -> int:
         """
-        Get the total number of documents in the collection.
+        Get the total number of documents in the collection. The number is counted once, then cached in a file
+        next to the collection.
 
         Returns:
             int: the total number of documents in the collection.
         """
+        if self._total_docs is None:
+            self._total_docs = self._read_docs_count()
         if self._total_docs is None:
             print("Computing documents number...")
-            # Count lines efficiently without loading the file
-            with gzip.open(self.file_path, 'rt', encoding='utf-8') as file:
-                next(file)  # Skip header
-                self._total_docs = sum(1 for _ in file)
+            self._total_docs = self._count_docs()
+            self._write_docs_count(self._total_docs)
         return self._total_docs
 
-    def process_single_chunk(self, start: int, chunk_size: int) -> pd.DataFrame:
+    def _count_docs(self) -> int:
         """
-        Process a single chunk of the collection starting from a given line.
+        Count the documents of the collection in a pass over the decompressed bytes, counting the line
+        endings of whole blocks instead of decoding and splitting the lines.
 
-        Args:
-            start(int): Line number to start reading from.
-            chunk_size(int): Number of lines to read in the chunk.
+        Returns:
+            int: the number of lines of the collection, header excluded.
+        """
+        with self._open_collection() as file:
+            raw_file = file.buffer
+            lines = 0
+            last_block = b""
+            for block in iter(lambda: raw_file.read(READ_BUFFER_SIZE), b""):
+                lines += block.count(b"\n")
+                last_block = block
+        # The last line is counted even without a final line ending, then the header is skipped
+        if last_block and not last_block.endswith(b"\n"):
+            lines += 1
+        return max(lines - 1, 0)
+
+    def _collection_signature(self) -> str:
+        """
+        Size and modification time of the collection file, which identify the version the count refers to.
 
         Returns:
-            pd.DataFrame: DataFrame containing the processed chunk.
+            str: The size and the modification time in nanoseconds, separated by a space.
         """
-        chunk = []
+        stat = os.stat(self.file_path)
+        return f"{stat.st_size} {stat.st_mtime_ns}"
+
+    def _read_docs_count(self) -> Optional[int]:
+        """
+        Read the number of documents cached next to the collection, if it was counted on the same version
+        of the collection.
+
+        Returns:
+            Optional[int]: The cached number of documents, or None if there is no valid cache.
+        """
+        try:
+            with open(self.file_path + DOCS_COUNT_SUFFIX) as f:
+                total_docs, signature = f.read().split(' ', 1)
+            return int(total_docs) if signature == self._collection_signature() else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_docs_count(self, total_docs: int) -> None:
+        """
+        Cache the number of documents next to the collection, with the size and modification time of the
+        collection, so that the next runs do not decompress it again. A collection in a read-only directory is
+        simply not cached.
+
+        Args:
+            total_docs(int): The number of documents of the collection.
+        """
+        try:
+            with open(self.file_path + DOCS_COUNT_SUFFIX, 'w') as f:
+                f.write(f"{total_docs} {self._collection_signature()}")
+        except OSError:
+            pass
+
+    def stream(self) -> Iterator[str]:
+        """
+        Stream the lines of the collection in a single pass over the file, skipping the header.
+        While the lines are consumed, the kernel is periodically asked to load the next PREFETCH_SIZE
+        compressed bytes into the page cache, so that the following chunks do not stall on cold reads.
 
-        with gzip.open(self.file_path, 'rt', encoding='utf-8') as file:
-            next(file)  # Skip header
-            for _ in range(start):
-                next(file)  # Skip lines until the start point
+        Yields:
+            str: Raw line of the collection.
+        """
+        with self._open_collection() as file:
+            next(file, None)  # Skip header
+            raw_file = file.buffer.fileobj
+            while True:
+                lines = list(islice(file, PREFETCH_INTERVAL_LINES))
+                if not lines:
+                    break
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(raw_file.fileno(), raw_file.tell(), PREFETCH_SIZE, os.POSIX_FADV_WILLNEED)
+                yield from lines
+
+    def lines_to_dataframe(self, lines: Iterable[str]) -> pd.DataFrame:
+        """
+        Parse raw lines of the collection into a DataFrame, dropping the malformed ones.
 
-            for _ in range(chunk_size):
-                line = file.readline()
-                if not line:
-                    break  # End of file reached
+        Args:
+            lines(Iterable[str]): Raw lines of the collection.
 
-                columns = line.strip().split('\t')
-                if len(columns) == len(self.column_names):
-                    chunk.append(columns)
+        Returns:
+            pd.DataFrame: DataFrame containing the parsed documents.
+        """
+        chunk = []
+        for line in lines:
+            columns = line.strip().split('\t')
+            if len(columns) == len(self.column_names):
+                chunk.append(columns)
 
         if chunk:
             df = pd.DataFrame(chunk, columns=self.column_names)
-            df['index'] = pd.to_numeric(df['index'], errors='coerce')
-            df = df.dropna(subset=['index'])
-            df['index'] = df['index'].astype(int)
+            try:
+                # Doc ids are almost always well-formed: convert them all at once in C
+                df['index'] = df['index'].astype(int)
+            except (ValueError, OverflowError):
+                df['index'] = pd.to_numeric(df['index'], errors='coerce')
+                df = df.dropna(subset=['index'])
+                df['index'] = df['index'].astype(int)
             return df
 
         return pd.DataFrame(columns=self.column_names)
 
+    def process_single_chunk(self, start: int, chunk_size: int) -> pd.DataFrame:
+        """
+        Process a single chunk of the collection starting from a given line.
+
+        Args:
+            start(int): Line number to start reading from.
+            chunk_size(int): Number of lines to read in the chunk.
+
+        Returns:
+            pd.DataFrame: DataFrame containing the processed chunk.
+        """
+        with closing(self.stream()) as lines:
+            return self.lines_to_dataframe(islice(lines, start, start + chunk_size))
+
     def process_chunks(self, chunk_size: int = None) -> Iterator[pd.DataFrame]:
         """
         Process the entire collection in chunks, yielding DataFrames at each iteration.
+        The collection is read in a single pass.
 
         Args:
             chunk_size: Optional override for chunk size. Default is 500000.
@@ -95,16 +216,18 @@ class CollectionLoader:
         if chunk_size is None:
             chunk_size = self.chunk_size
 
-        total_lines = self.get_total_docs()  # Implement this method if needed
-        start = 0
-
-        while start < total_lines:
-            yield self.process_single_chunk(start, chunk_size)
-            start += chunk_size
+        lines = self.stream()
+        while True:
+            chunk_lines = list(islice(lines, chunk_size))
+            if not chunk_lines:
+                break
+            yield self.lines_to_dataframe(chunk_lines)
 
     def sample_lines(self, num_lines: int = 10) -> pd.DataFrame:
         """
-        Sample random lines from collection using reservoir sampling.
+        Sample random lines from collection using reservoir sampling, with Algorithm L: the number of lines
+        to skip before the next replacement is drawn directly, so that random numbers are only drawn for the
+        lines entering the reservoir instead of for every line.
 
         Args:
             num_lines(int): Number of lines to sample. Default is 10.
@@ -113,17 +236,21 @@ class CollectionLoader:
             pd.DataFrame: Sampled documents.
         """
         self._total_docs = num_lines
-        with gzip.open(self.file_path, 'rt', encoding='utf-8') as f:
+        with self._open_collection() as f:
             next(f)  # Skip header
-            reservoir = []
-
-            for i, line in enumerate(f, 1):
-                if len(reservoir) < num_lines:
-                    reservoir.append(line)
-                else:
-                    j = random.randint(0, i)
-                    if j < num_lines:
-                        reservoir[j] = line
+            reservoir = list(islice(f, num_lines))
+
+            if num_lines > 0 and len(reservoir) == num_lines:
+                w = math.exp(math.log(self._random_unit()) / num_lines)
+                while True:
+                    # Skip a geometrically distributed number of lines, consumed in C by islice.
+                    # When w rounds to 1, the skip is 0 as its limit
+                    skip = math.floor(math.log(self._random_unit()) / math.log1p(-w)) if w < 1.0 else 0
+                    line = next(islice(f, skip, None), None)
+                    if line is None:
+                        break
+                    reservoir[random.randrange(num_lines)] = line
+                    w *= math.exp(math.log(self._random_unit()) / num_lines)
 
         # Process sampled lines
         sample_df = pd.read_csv(
@@ -142,6 +269,19 @@ class CollectionLoader:
 
         return sample_df
 
+    @staticmethod
+    def _random_unit() -> float:
+        """
+        Draws a uniform random number in the open interval (0, 1), whose logarithm is always defined.
+
+        Returns:
+            float: The random number.
+        """
+        u = random.random()
+        while u == 0.0:
+            u = random.random()
+        return u
+
     def get_documents_by_ids(self, doc_ids: List[int]) -> List[str]:
         """
         Retrieves the text of documents corresponding to the given list of doc_ids.
@@ -153,18 +293,22 @@ class CollectionLoader:
         Returns:
             List[str]: A list of document texts.
         """
+        # Hashed once, instead of at every chunk
+        wanted_ids = set(doc_ids)
+        found_ids = set()
         documents = []
-        # Iterate over chunks of the collection
-        for chunk in self.process_chunks(sys.maxsize):
+        # Iterate over chunks of the collection, so that the search stops at the chunk holding the last document
+        for chunk in self.process_chunks():
             # Filter the chunk for matching doc_ids
-            matching_docs = chunk[chunk['index'].isin(doc_ids)]
+            matching_docs = chunk[chunk['index'].isin(wanted_ids)]
 
             # If matching documents exist in this chunk, extract the text
             if not matching_docs.empty:
                 documents.extend(matching_docs['text'].tolist())
+                found_ids.update(matching_docs['index'].tolist())
 
             # If we've found all documents, we can stop early
-            if len(documents) == len(doc_ids):
+            if found_ids >= wanted_ids:
                 break
 
         # Return the list of document texts (or a message if not found)
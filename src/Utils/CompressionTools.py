@@ -1,6 +1,21 @@
 import struct
 from typing import List, Tuple
 
+import numpy as np
+
+# First byte of the block-based encoding. Legacy posting lists start with their byte width (1 to 8) instead
+BLOCKED_CODEC_TAG = 0x80
+# Number of postings bit-packed together in a block, sharing the same bit width
+BLOCK_SIZE = 128
+# Number of blocks bit-packed or unpacked at a time, to bound the temporary arrays
+PACKING_BATCH_BLOCKS = 1024
+# Flag set on the width of a doc ID block stored as a bitset, the low bits hold its number of 64-bit words
+BITSET_FLAG = 0x80
+# A block is stored as a bitset only if it covers at least 1 document out of BITSET_MIN_DENSITY
+BITSET_MIN_DENSITY = 6
+# Thresholds used to compute bit lengths: a value needs k bits if it is lower than 2 ** k
+_POWERS_OF_TWO = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
 
 class CompressionTools:
 
@@ -15,41 +30,69 @@ class CompressionTools:
         Returns:
             Tuple[List[int], List[int]]: The list of doc_ids and relative frequencies.
         """
-        if len(data) == 0:
-            return [], []  # Handle empty data gracefully
+        doc_ids, frequencies = CompressionTools.p_for_delta_decompress_arrays(data)
+        return doc_ids.tolist(), frequencies.tolist()
 
-        bit_width = struct.unpack("B", data[:1])[0]
-        data = data[1:]
+    @staticmethod
+    def p_for_delta_decompress_arrays(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decompresses data into NumPy arrays of doc IDs and term frequencies, without building Python ints.
 
-        deltas = []
-        frequencies = []
+        Args:
+            data(bytes): Data to decompress (postings).
 
-        # Calculate the number of elements for deltas and frequencies
-        total_length = len(data)
-        half_length = total_length // 2
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The int64 arrays of doc_ids and relative frequencies.
+        """
+        deltas, frequencies = CompressionTools._decode_deltas(data)
 
-        # Split data into deltas and frequencies
-        delta_data = data[:half_length]
-        freq_data = data[half_length:]
+        # Reconstruct original doc IDs from deltas with a prefix sum written over the freshly decoded deltas,
+        # without allocating another array
+        return np.cumsum(deltas, out=deltas), frequencies
 
-        # Decompress deltas
-        for i in range(0, len(delta_data), bit_width):
-            delta = int.from_bytes(delta_data[i:i + bit_width], byteorder='big')
-            deltas.append(delta)
+    @staticmethod
+    def p_for_delta_count(data: bytes) -> int:
+        """
+        Counts the postings stored in compressed data, reading only its header.
 
-        # Decompress frequencies
-        for i in range(0, len(freq_data), bit_width):
-            freq = int.from_bytes(freq_data[i:i + bit_width], byteorder='big')
-            frequencies.append(freq)
+        Args:
+            data(bytes): Compressed postings.
 
-        # Ensure doc_ids and frequencies are aligned
-        if len(deltas) != len(frequencies):
-            raise ValueError("Mismatched number of deltas and frequencies.")
+        Returns:
+            int: The number of postings.
+        """
+        if len(data) == 0:
+            return 0
+        if data[0] == BLOCKED_CODEC_TAG:
+            return struct.unpack_from("=I", data, 1)[0]
+        return (len(data) - 1) // (2 * data[0])
+
+    @staticmethod
+    def p_for_delta_decompress_many(blocks: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decompresses several compressed posting lists at once into two concatenated NumPy arrays.
+        The output size is computed from the block headers, so that both arrays are allocated only once.
 
-        # Reconstruct original doc IDs from deltas
-        doc_ids = [deltas[0]]
-        for delta in deltas[1:]:
-            doc_ids.append(doc_ids[-1] + delta)
+        Args:
+            blocks(List[bytes]): Compressed posting lists.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The int64 arrays of doc_ids and relative frequencies of all the
+            blocks, one after the other.
+        """
+        counts = [CompressionTools.p_for_delta_count(block) for block in blocks]
+        doc_ids = np.empty(sum(counts), dtype=np.int64)
+        frequencies = np.empty(len(doc_ids), dtype=np.int64)
+
+        start = 0
+        for block, count in zip(blocks, counts):
+            if count == 0:
+                continue
+            end = start + count
+            deltas, frequencies[start:end] = CompressionTools._decode_deltas(block)
+            # Deltas restart from zero in every posting list: reconstruct the doc IDs of each one separately
+            np.cumsum(deltas, out=doc_ids[start:end])
+            start = end
 
         return doc_ids, frequencies
 
@@ -57,6 +100,10 @@ class CompressionTools:
     def p_for_delta_compress(doc_ids: List[int], frequencies: List[int]) -> bytes:
         """
         Compresses data into a list of doc IDs and term frequencies using the p for delta compression algorithm.
+        The doc ID deltas and the frequencies are bit-packed in blocks of BLOCK_SIZE postings, each one with
+        the bit width of its largest value, or as a bitset for dense doc ID blocks. The postings after the last
+        full block are stored as varints.
+        Layout: tag byte, number of postings (uint32), two bit widths per block, packed blocks, varints.
 
         Args:
             doc_ids(List[int]): Doc_ids to compress.
@@ -71,24 +118,304 @@ class CompressionTools:
         if len(doc_ids) == 0:  # Handle empty input lists
             return b""
 
+        doc_ids_array = np.asarray(doc_ids, dtype=np.int64)
+        frequencies_array = np.asarray(frequencies, dtype=np.int64)
+
         # Delta encode the doc IDs
-        deltas = [doc_ids[0]] + [doc_ids[i] - doc_ids[i - 1] for i in range(1, len(doc_ids))]
+        deltas = np.diff(doc_ids_array, prepend=0)
+        if deltas[1:].min(initial=0) < 0:
+            raise ValueError("doc_ids must be sorted in ascending order.")
+
+        # Split the postings in bit-packed blocks of BLOCK_SIZE values, the remaining ones are stored as varints
+        num_blocks = len(deltas) // BLOCK_SIZE
+        packed_length = num_blocks * BLOCK_SIZE
+        block_values = np.stack((
+            deltas[:packed_length].reshape(num_blocks, BLOCK_SIZE),
+            frequencies_array[:packed_length].reshape(num_blocks, BLOCK_SIZE),
+        ), axis=1).reshape(2 * num_blocks, BLOCK_SIZE).astype(np.uint64)
+
+        # Every block stores its deltas and its frequencies with the bit width of their largest value
+        bit_widths = CompressionTools._bit_lengths(block_values.max(axis=1, initial=0)).astype(np.uint8)
+
+        # Dense doc ID blocks are stored as bitsets of the positions relative to their first document,
+        # when smaller than the packed deltas. Their first delta is stored as a varint
+        doc_rows = block_values[0::2]
+        positions = np.cumsum(doc_rows[:, 1:], axis=1)
+        doc_ranges = positions[:, -1] if num_blocks else np.empty(0, dtype=np.uint64)
+        bitset_words = (doc_ranges // 64 + 1).astype(np.int64)
+        bitset_blocks = np.flatnonzero(
+            (doc_ranges < BLOCK_SIZE * BITSET_MIN_DENSITY)
+            & (bitset_words * 64 < BLOCK_SIZE * bit_widths[0::2].astype(np.int64))
+            & (doc_rows[:, 1:].min(axis=1, initial=1) > 0))
+        first_deltas = doc_rows[bitset_blocks, 0]
+        doc_rows[bitset_blocks, 0] = 0
+        doc_rows[bitset_blocks, 1:] = positions[bitset_blocks]
+        bit_widths[2 * bitset_blocks] = BITSET_FLAG | bitset_words[bitset_blocks]
+
+        return b"".join((
+            struct.pack("=BI", BLOCKED_CODEC_TAG, len(deltas)),
+            bit_widths.tobytes(),
+            CompressionTools._pack_blocks(block_values, bit_widths) if num_blocks else b"",
+            CompressionTools._to_varint_bytes(np.concatenate((
+                first_deltas, deltas[packed_length:], frequencies_array[packed_length:])).astype(np.uint64)),
+        ))
+
+    @staticmethod
+    def _decode_deltas(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decodes compressed postings into the int64 arrays of doc_id deltas and frequencies, for both the
+        block-based encoding and the legacy fixed-width one.
+
+        Args:
+            data(bytes): Data to decompress (postings).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The int64 arrays of doc_id deltas and relative frequencies.
+        """
+        if len(data) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)  # Handle empty data gracefully
+
+        if data[0] != BLOCKED_CODEC_TAG:
+            return CompressionTools._decode_legacy_deltas(data)
+
+        num_postings = struct.unpack_from("=I", data, 1)[0]
+        num_blocks = num_postings // BLOCK_SIZE
+        packed_length = num_blocks * BLOCK_SIZE
+        header_length = struct.calcsize("=BI")
+
+        bit_widths = np.frombuffer(data, dtype=np.uint8, count=2 * num_blocks, offset=header_length)
+        payload = memoryview(data)[header_length + len(bit_widths):]
+        block_values, consumed = CompressionTools._unpack_blocks(payload, bit_widths) if num_blocks else (None, 0)
+
+        # The varints hold the first delta of the bitset blocks, then the postings following the last full
+        # block: deltas first, then frequencies
+        bitset_blocks = np.flatnonzero(bit_widths[0::2] & BITSET_FLAG)
+        varints = CompressionTools._from_varint_bytes(payload[consumed:]).astype(np.int64)
+        if len(varints) != len(bitset_blocks) + 2 * (num_postings - packed_length):
+            raise ValueError("Mismatched number of deltas and frequencies.")
+        tail_deltas, tail_frequencies = np.split(varints[len(bitset_blocks):], 2)
+        if not num_blocks:
+            return tail_deltas, tail_frequencies
+
+        block_values = block_values.astype(np.int64).reshape(num_blocks, 2, BLOCK_SIZE)
+        # Bitset blocks were unpacked as positions relative to their first document: turn them back into deltas
+        positions = block_values[bitset_blocks, 0]
+        positions[:, 1:] = np.diff(positions, axis=1)
+        positions[:, 0] = varints[:len(bitset_blocks)]
+        block_values[bitset_blocks, 0] = positions
+        deltas = np.concatenate((block_values[:, 0].ravel(), tail_deltas))
+        frequencies = np.concatenate((block_values[:, 1].ravel(), tail_frequencies))
+        return deltas, frequencies
+
+    @staticmethod
+    def _decode_legacy_deltas(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decodes postings compressed with the legacy encoding, where a header byte holds the byte width shared by
+        all the big-endian deltas and frequencies that follow.
+
+        Args:
+            data(bytes): Data to decompress (postings).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The int64 arrays of doc_id deltas and relative frequencies.
+        """
+        bit_width = data[0]
+        payload = memoryview(data)[1:]
+
+        # Deltas and frequencies are stored one after the other, with the same number of values
+        if len(payload) % (2 * bit_width) != 0:
+            raise ValueError("Mismatched number of deltas and frequencies.")
+
+        values = CompressionTools._from_fixed_width_bytes(payload, bit_width)
+        deltas, frequencies = np.split(values, 2)
+        return deltas, frequencies
+
+    @staticmethod
+    def _bit_lengths(values: np.ndarray) -> np.ndarray:
+        """
+        Computes the number of bits needed to store each value.
+
+        Args:
+            values(np.ndarray): Non-negative integers.
+
+        Returns:
+            np.ndarray: The bit length of each value, 0 for zeros.
+        """
+        return np.searchsorted(_POWERS_OF_TWO, values.astype(np.uint64), side='right')
+
+    @staticmethod
+    def _block_sizes(bit_widths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the size in bytes of packed blocks and their offsets, one after the other.
+
+        Args:
+            bit_widths(np.ndarray): The bit width of each block, or its number of words for bitsets.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The int64 sizes and offsets of the blocks.
+        """
+        bit_widths = bit_widths.astype(np.int64)
+        block_sizes = np.where(bit_widths & BITSET_FLAG, (bit_widths & ~BITSET_FLAG) * 8, bit_widths * (BLOCK_SIZE // 8))
+        return block_sizes, np.cumsum(block_sizes) - block_sizes
+
+    @staticmethod
+    def _pack_blocks(block_values: np.ndarray, bit_widths: np.ndarray) -> bytes:
+        """
+        Bit-packs blocks of BLOCK_SIZE values, each one with its own bit width: a block of width w takes
+        BLOCK_SIZE * w / 8 bytes. Blocks with the same width are packed together.
+        Blocks flagged with BITSET_FLAG hold increasing positions, stored as a bitset of 64-bit words.
+
+        Args:
+            block_values(np.ndarray): The uint64 values, one block per row.
+            bit_widths(np.ndarray): The bit width of each block, or its flagged number of words for bitsets.
+
+        Returns:
+            bytes: The packed blocks, one after the other.
+        """
+        block_sizes, block_offsets = CompressionTools._block_sizes(bit_widths)
+        packed = np.empty(int(block_sizes.sum()), dtype=np.uint8)
+
+        for bit_width in np.unique(bit_widths[bit_widths > 0]).tolist():
+            blocks = np.flatnonzero(bit_widths == bit_width)
+            if bit_width & BITSET_FLAG:
+                # Values are positions inside the bitset: set their bits, least significant first
+                bits = np.zeros((len(blocks), (bit_width & ~BITSET_FLAG) * 64), dtype=np.uint8)
+                bits[np.arange(len(blocks))[:, None], block_values[blocks].astype(np.int64)] = 1
+                rows = np.packbits(bits, axis=1, bitorder='little')
+                packed[block_offsets[blocks, None] + np.arange(rows.shape[1])] = rows
+                continue
+            for start in range(0, len(blocks), PACKING_BATCH_BLOCKS):
+                batch = blocks[start:start + PACKING_BATCH_BLOCKS]
+                # Spread the bits of every value, most significant first, keep the low bit_width ones
+                # and pack them back 8 by 8
+                value_bytes = block_values[batch].astype('>u8').view(np.uint8).reshape(len(batch), BLOCK_SIZE, 8)
+                bits = np.unpackbits(value_bytes, axis=-1)
+                rows = np.packbits(bits[..., 64 - bit_width:].reshape(len(batch), -1), axis=1)
+                packed[block_offsets[batch, None] + np.arange(rows.shape[1])] = rows
 
-        # Determine bit width
-        max_bits = max((delta.bit_length() for delta in deltas), default=1)
-        max_bits_freq = max((freq.bit_length() for freq in frequencies), default=1)
-        bit_width = (max(max_bits, max_bits_freq) + 7) // 8  # Convert bits to bytes
+        return packed.tobytes()
 
-        # Compress both deltas and frequencies
-        compressed_bytes = bytearray()
-        compressed_bytes.extend(struct.pack("B", bit_width))
+    @staticmethod
+    def _unpack_blocks(buffer: memoryview, bit_widths: np.ndarray) -> Tuple[np.ndarray, int]:
+        """
+        Unpacks blocks of BLOCK_SIZE values bit-packed by _pack_blocks. Every value is read with a single
+        unaligned 64-bit load followed by a shift and a mask, precomputed for each position in the block.
+        Bitset blocks are unpacked into the positions of their set bits.
+
+        Args:
+            buffer(memoryview): The packed blocks, possibly followed by other data.
+            bit_widths(np.ndarray): The bit width of each block, or its flagged number of words for bitsets.
+
+        Returns:
+            Tuple[np.ndarray, int]: The uint64 values, one block per row, and the number of bytes read.
+        """
+        block_sizes, block_offsets = CompressionTools._block_sizes(bit_widths)
+        consumed = int(block_sizes.sum())
+        if consumed > len(buffer):
+            raise ValueError("Truncated bit-packed blocks.")
 
-        # Compress deltas
-        for delta in deltas:
-            compressed_bytes.extend(delta.to_bytes(bit_width, byteorder='big'))
+        # Zero padding, so that the 64-bit loads of the last values never read past the end
+        packed = np.zeros(consumed + 8, dtype=np.uint8)
+        packed[:consumed] = np.frombuffer(buffer, dtype=np.uint8, count=consumed)
+        # Big-endian 64-bit words starting at every byte of the packed data
+        words_at = np.ndarray(shape=(consumed + 1,), dtype='>u8', buffer=packed, strides=(1,))
+        block_values = np.zeros((len(bit_widths), BLOCK_SIZE), dtype=np.uint64)
 
-        # Compress frequencies
-        for freq in frequencies:
-            compressed_bytes.extend(freq.to_bytes(bit_width, byteorder='big'))
+        for bit_width in np.unique(bit_widths[bit_widths > 0]).tolist():
+            blocks = np.flatnonzero(bit_widths == bit_width)
+            bit_offsets = np.arange(BLOCK_SIZE) * bit_width
+            if bit_width & BITSET_FLAG:
+                rows = packed[block_offsets[blocks, None] + np.arange(block_sizes[blocks[0]])]
+                bitset_length = rows.shape[1] * 8
+                set_bits = np.flatnonzero(np.unpackbits(rows, bitorder='little'))
+                if len(set_bits) != len(blocks) * BLOCK_SIZE:
+                    raise ValueError("Mismatched number of positions in a bitset block.")
+                set_bits = set_bits.reshape(len(blocks), BLOCK_SIZE)
+                # Every block must hold exactly BLOCK_SIZE positions: its first and last set bits are in its row
+                block_starts = np.arange(len(blocks))[:, None] * bitset_length
+                if ((set_bits[:, [0, -1]] - block_starts) // bitset_length).any():
+                    raise ValueError("Mismatched number of positions in a bitset block.")
+                block_values[blocks] = set_bits - block_starts
+            elif bit_width <= 57:
+                # A value spans at most 8 bytes when it does not start on a byte boundary
+                shifts = (64 - bit_width - (bit_offsets & 7)).astype(np.uint64)
+                mask = np.uint64((1 << bit_width) - 1)
+                byte_indices = block_offsets[blocks, None] + (bit_offsets >> 3)
+                words = words_at[byte_indices].astype(np.uint64)
+                block_values[blocks] = (words >> shifts) & mask
+            else:
+                rows = packed[block_offsets[blocks, None] + np.arange(block_sizes[blocks[0]])]
+                bits = np.unpackbits(rows, axis=1).reshape(len(blocks), BLOCK_SIZE, bit_width)
+                padded = np.zeros((len(blocks), BLOCK_SIZE, 64), dtype=np.uint8)
+                padded[..., 64 - bit_width:] = bits
+                block_values[blocks] = np.packbits(padded, axis=-1).view('>u8')[..., 0]
+
+        return block_values, consumed
+
+    @staticmethod
+    def _to_varint_bytes(values: np.ndarray) -> bytes:
+        """
+        Serializes integers as varints: 7 bits per byte, least significant first, with the high bit set on every
+        byte but the last one of each integer.
+
+        Args:
+            values(np.ndarray): Non-negative uint64 integers to serialize.
+
+        Returns:
+            bytes: The serialized integers.
+        """
+        if len(values) == 0:
+            return b""
+
+        num_bytes = np.maximum((CompressionTools._bit_lengths(values) + 6) // 7, 1)
+        byte_positions = np.arange(num_bytes.max())
+        groups = (values[:, None] >> (7 * byte_positions).astype(np.uint64)) & np.uint64(0x7F)
+        groups |= np.where(byte_positions < num_bytes[:, None] - 1, np.uint64(0x80), np.uint64(0))
+        return groups.astype(np.uint8)[byte_positions < num_bytes[:, None]].tobytes()
+
+    @staticmethod
+    def _from_varint_bytes(buffer: memoryview) -> np.ndarray:
+        """
+        Parses integers serialized by _to_varint_bytes.
+
+        Args:
+            buffer(memoryview): The serialized integers.
+
+        Returns:
+            np.ndarray: The uint64 parsed integers.
+        """
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        if len(raw) == 0:
+            return np.empty(0, dtype=np.uint64)
+
+        is_last = raw < 0x80
+        if not is_last[-1]:
+            raise ValueError("Truncated varint.")
+
+        # Position of every byte inside its integer, used to shift its 7 bits in place
+        starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+        value_ids = np.cumsum(is_last) - is_last
+        byte_positions = np.arange(len(raw)) - starts[value_ids]
+        groups = (raw & 0x7F).astype(np.uint64) << (7 * byte_positions).astype(np.uint64)
+        return np.bitwise_or.reduceat(groups, starts)
+
+    @staticmethod
+    def _from_fixed_width_bytes(buffer: memoryview, bit_width: int) -> np.ndarray:
+        """
+        Parses big-endian integers of bit_width bytes each, in a single vectorized pass.
+
+        Args:
+            buffer(memoryview): The serialized integers.
+            bit_width(int): Number of bytes per integer (at most 8).
+
+        Returns:
+            np.ndarray: The int64 parsed integers.
+        """
+        if bit_width in (1, 2, 4, 8):
+            return np.frombuffer(buffer, dtype=f'>u{bit_width}').astype(np.int64)
 
-        return bytes(compressed_bytes)
+        # Left-pad every integer with zero bytes up to 64 bits
+        raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, bit_width)
+        padded = np.zeros((len(raw), 8), dtype=np.uint8)
+        padded[:, 8 - bit_width:] = raw
+        return padded.view('>u8').ravel().astype(np.int64)
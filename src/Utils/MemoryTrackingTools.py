@@ -1,26 +1,46 @@
+import time
+from functools import lru_cache
+
 import psutil
 
+# Maximum age, in seconds, of a cached reading of the available memory that callers may opt into
+AVAILABLE_MEMORY_TTL = 0.25
+
 
 class MemoryTrackingTools:
+    # Last reading of the available memory, as (monotonic timestamp, bytes)
+    _last_available_reading = (float('-inf'), 0)
+
     def __init__(self):
         """Initialize the MemoryTrackingTools class."""
         pass
 
     @staticmethod
-    def get_available_memory() -> int:
+    def get_available_memory(max_age: float = 0.0) -> int:
         """
         Get available memory on the system (in bytes).
 
+        Args:
+            max_age(float): Maximum age in seconds of a previous reading that can be returned instead of
+            querying the system again. Default is 0, which always queries the system.
+
         Returns:
             int: Available system memory in bytes.
         """
+        now = time.monotonic()
+        timestamp, available_memory = MemoryTrackingTools._last_available_reading
+        if now - timestamp < max_age:
+            return available_memory
+
         available_memory = psutil.virtual_memory().available
+        MemoryTrackingTools._last_available_reading = (now, available_memory)
         return available_memory
 
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_total_memory() -> int:
         """
-        Get the total system memory in bytes.
+        Get the total system memory in bytes. The physical memory does not change, so it is read only once.
 
         Returns:
             int: Total system memory in bytes.
@@ -1,15 +1,29 @@
 import logging
+import os
 import re
+import sys
 from functools import lru_cache
 from multiprocessing import Pool, cpu_count
-from typing import List, Union, Optional
+from typing import Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import psutil
 import unicodedata
 from nltk import PorterStemmer
 from nltk.corpus import stopwords
 from tqdm import tqdm
 
+# Number of stemmed words kept in memory by every process: word frequencies are Zipfian, so most tokens are
+# stemmed only once
+STEM_CACHE_SIZE = 1 << 17
+# Number of batches of documents handed to every worker process: batches amortize the inter-process
+# communication, while several batches per worker keep the load balanced
+PREPROCESS_BATCHES_PER_WORKER = 16
+# Minimum number of texts preprocessed by a pool of worker processes: below it, starting the workers and
+# sending them the texts takes longer than the preprocessing itself
+PARALLEL_MIN_TEXTS = 2000
+
 
 class Preprocessing:
     # Compile regex patterns as class variables to avoid repetition
@@ -33,8 +47,15 @@ class Preprocessing:
 
     HTML_PATTERN = re.compile(r'<[^>]+>')
     SCRIPT_STYLE_PATTERN = re.compile(r'<(script|style)[^>]*>.*?</\1>', re.DOTALL)
-    NON_WORD_PATTERN = re.compile(r'[^\w\s-]')
-    WHITESPACE_PATTERN = re.compile(r'\s+')
+    # Maps the ASCII punctuation and whitespace other than hyphens and underscores to spaces
+    NON_WORD_TABLE = str.maketrans({c: ' ' for c in map(chr, range(128)) if not (c.isalnum() or c in '_-')})
+    TOKEN_SEPARATOR_PATTERN = re.compile(r'\W+')
+
+    # Shared by all the instances, so that the stems cached by a worker process survive across its tasks
+    STEMMER = PorterStemmer()
+
+    # Fixed instance attributes: no per-instance dict, and faster attribute reads in the per-document methods
+    __slots__ = ('stop_words', 'stemmer', 'use_cache', 'stopwords_flag', 'stem_flag', 'min_word_length')
 
     def __init__(self, use_cache: bool = True, stopwords_flag: bool = True,
                  stem_flag: bool = True, min_word_length: int = 2):
@@ -47,15 +68,15 @@ class Preprocessing:
             stem_flag(bool): Flag to decide if performing stepping or not. Default is true.
             min_word_length(int): Minimum valid word length. Default is 2.
         """
-        self.stop_words = set(stopwords.words('english'))
-        self.stemmer = PorterStemmer()
+        # Immutable set, loaded once: stopwords are filtered out before any posting is built
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.stemmer = Preprocessing.STEMMER
         self.use_cache = use_cache
         self.stopwords_flag = stopwords_flag
         self.stem_flag = stem_flag
         self.min_word_length = min_word_length
 
     @staticmethod
-    @lru_cache
     def clean_text(text: str) -> Optional[str]:
         """
         Method to perform text cleaning.
@@ -66,29 +87,34 @@ class Preprocessing:
         Returns:
             Optional[str]: If something is left, it's returned.
         """
-        if not isinstance(text, str) or not text.strip():
+        if not isinstance(text, str) or not text or text.isspace():
             return None
 
-        # Normalize text
-        text = (unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
-                .decode('utf-8', 'ignore'))
+        # Normalize text: an ASCII string, flagged as such by the interpreter, is already normalized
+        if not text.isascii():
+            text = (unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
+                    .decode('utf-8', 'ignore'))
 
-        # Remove script and style tags with their content
-        text = Preprocessing.SCRIPT_STYLE_PATTERN.sub(' ', text)
+        # Tags and URLs cannot be found without their '<' and '.' characters: the substring checks run in C and
+        # spare the regex scans to the documents without them
+        if '<' in text:
+            # Remove script and style tags with their content
+            text = Preprocessing.SCRIPT_STYLE_PATTERN.sub(' ', text)
 
-        # Remove all HTML tags and their content
-        text = re.sub(r'<[^>]+>', ' ', text)
+            # Remove all HTML tags and their content
+            text = Preprocessing.HTML_PATTERN.sub(' ', text)
 
         # Remove noise and URLs
         text = Preprocessing.NOISE_PATTERN.sub(' ', text)
-        text = Preprocessing.URL_PATTERN.sub(' ', text)
+        if '.' in text:
+            text = Preprocessing.URL_PATTERN.sub(' ', text)
 
-        # Clean up remaining text
-        text = Preprocessing.NON_WORD_PATTERN.sub(' ', text)
-        text = Preprocessing.WHITESPACE_PATTERN.sub(' ', text)
+        # Clean up remaining text: the text is ASCII, so punctuation is replaced with spaces through a lookup
+        # table, then splitting and joining collapses and strips the whitespace
+        text = ' '.join(text.translate(Preprocessing.NON_WORD_TABLE).split())
 
-        # Lower and strip
-        cleaned = text.strip().lower()
+        # Lower
+        cleaned = text.lower()
         return cleaned if cleaned else None
 
     def tokenize(self, text: str) -> List[str]:
@@ -105,17 +131,28 @@ class Preprocessing:
             return []
 
         # Split text into tokens using non-word boundaries, preserving standalone words
-        tokens = re.split(r'\W+', text)
+        return self._filter_tokens(Preprocessing.TOKEN_SEPARATOR_PATTERN.split(text))
+
+    def _filter_tokens(self, tokens: List[str]) -> List[str]:
+        """
+        Filter the tokens split from a text.
+
+        Args:
+            tokens(List[str]): Tokens to filter.
 
+        Returns:
+            List[str]: A list of cleaned tokens.
+        """
         # Filter tokens based on rules:
         # - Remove tokens shorter than the minimum word length
-        # - Exclude pure numbers
-        # - Ensure tokens contain at least one alphabetic character
+        # - Ensure tokens contain at least one alphabetic character, which also excludes pure numbers
+        # Most tokens are made of letters only, and are accepted by a single isalpha call in C before the
+        # per-character check
+        min_word_length = self.min_word_length
         tokens = [
             token for token in tokens
-            if len(token) >= self.min_word_length
-               and any(c.isalpha() for c in token)  # At least one letter
-               and not token.isdigit()  # Exclude pure numbers
+            if len(token) >= min_word_length
+               and (token.isalpha() or any(c.isalpha() for c in token))  # At least one letter
         ]
 
         return tokens
@@ -142,19 +179,22 @@ class Preprocessing:
         Returns:
             List[str]: List of stemmed tokens.
         """
-        return [self.stemmer.stem(word) for word in tokens]
+        stem = Preprocessing._stem
+        return [stem(word) for word in tokens]
 
-    def _process_text_helper(self, args: tuple) -> List[str]:
+    @staticmethod
+    @lru_cache(maxsize=STEM_CACHE_SIZE)
+    def _stem(word: str) -> str:
         """
-        Helper function to perform the parallel vectorized preprocessing.
+        Stems a word, caching the stems of the most recent words.
 
         Args:
-            args(tuple): A tuple containing the arguments to pass to the single text preprocess method.
+            word(str): The word to stem.
 
-        Returns: A list of preprocessed tokens.
+        Returns:
+            str: The stem of the word.
         """
-        text, stopwords_flag, stem_flag = args
-        return self.single_text_preprocess(text)
+        return Preprocessing.STEMMER.stem(word)
 
     def single_text_preprocess(self, text: str) -> List[str]:
         """
@@ -174,7 +214,15 @@ class Preprocessing:
             if not cleaned_text:
                 return []
 
-            tokens = self.tokenize(cleaned_text)
+            # Cleaned text only has words, hyphens and single spaces: hyphens are the only other separators,
+            # so a plain split gives the tokens without running the separator regex
+            tokens = self._filter_tokens(cleaned_text.replace('-', ' ').split())
+
+            if self.stopwords_flag and self.stem_flag:
+                # Stopwords removal and stemming fused in a single pass over the tokens
+                stop_words = self.stop_words
+                stem = Preprocessing._stem
+                return [stem(word) for word in tokens if word not in stop_words]
 
             if self.stopwords_flag:
                 tokens = self.remove_stopwords(tokens)
@@ -188,25 +236,126 @@ class Preprocessing:
             logging.error(f"Error during preprocessing: {e}")
             return []
 
-    def vectorized_preprocess(self, texts: Union[pd.Series, List[str]]) -> List[List[str]]:
+    @staticmethod
+    def _default_num_workers() -> int:
         """
-        Method to perform an efficient vectorized preprocessing.
+        Default number of worker processes: one less than the cores available to the process, since the main
+        process consumes the results. Only the CPUs the process is allowed to run on are counted, and no more
+        than the physical cores: preprocessing is memory bound, and workers sharing a core slow each other down.
+        A single core gives 1, which preprocesses in the current process.
+
+        Returns:
+            int: The number of worker processes, at least 1.
+        """
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else cpu_count()
+        physical_cores = psutil.cpu_count(logical=False)
+        if physical_cores:
+            cores = min(cores, physical_cores)
+        return max(1, cores - 1)
+
+    def _preprocess_iter(self, texts: Union[pd.Series, List[str]],
+                         n_process: Optional[int] = None) -> Iterator[List[str]]:
+        """
+        Preprocess the texts in a pool of worker processes, yielding the tokens of each text in order.
+        Fewer than PARALLEL_MIN_TEXTS texts, or a single process, are preprocessed in the current process.
 
         Args:
             texts(List[str]): A list of texts to preprocess.
+            n_process(Optional[int]): Number of worker processes. Default is one less than the available cores.
 
-        Returns:
-            List[List[str]]: A list of lists of tokens, one for each input text.
+        Yields:
+            List[str]: The list of tokens of a text.
         """
         if isinstance(texts, pd.Series):
             texts = texts.tolist()
 
-        args = [(text, self.stopwords_flag, self.stem_flag) for text in texts]
+        num_workers = Preprocessing._default_num_workers() if n_process is None else n_process
+        if num_workers <= 1 or (n_process is None and len(texts) < PARALLEL_MIN_TEXTS):
+            yield from map(self.single_text_preprocess, texts)
+            return
+
+        # The preprocessing settings are sent once per worker: the tasks only carry the texts, in batches
+        batch_size = max(1, len(texts) // (num_workers * PREPROCESS_BATCHES_PER_WORKER))
+        settings = (self.use_cache, self.stopwords_flag, self.stem_flag, self.min_word_length)
 
-        with Pool(cpu_count() - 1) as pool:
-            all_preprocessed = list(tqdm(
-                pool.imap(self._process_text_helper, args),
+        with Pool(num_workers, initializer=_init_worker, initargs=settings) as pool:
+            # Refresh the progress bar at most every couple of seconds, or every 0.1% of the documents
+            yield from tqdm(
+                pool.imap(_process_text_worker, texts, chunksize=batch_size),
                 total=len(texts),
-            ))
+                mininterval=2.0,
+                miniters=max(1, len(texts) // 1000),
+                smoothing=0,
+            )
+
+    def vectorized_preprocess(self, texts: Union[pd.Series, List[str]],
+                              n_process: Optional[int] = None) -> List[List[str]]:
+        """
+        Method to perform an efficient vectorized preprocessing.
+
+        Args:
+            texts(List[str]): A list of texts to preprocess.
+            n_process(Optional[int]): Number of worker processes, 1 to preprocess in the current process.
+            Default is one less than the available cores, for at least PARALLEL_MIN_TEXTS texts.
+
+        Returns:
+            List[List[str]]: A list of lists of tokens, one for each input text.
+        """
+        return list(self._preprocess_iter(texts, n_process))
+
+    def vectorized_preprocess_flat(self, texts: Union[pd.Series, List[str]],
+                                   n_process: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Vectorized preprocessing returning the tokens of all the texts in a single flat list, with the
+        offsets of each text (CSR layout): the tokens of text i are tokens[offsets[i]:offsets[i + 1]].
+        The per-text lists are released as soon as they are received from the workers, and every token is
+        interned, so that all the occurrences of a token share a single string object.
+
+        Args:
+            texts(List[str]): A list of texts to preprocess.
+            n_process(Optional[int]): Number of worker processes, 1 to preprocess in the current process.
+            Default is one less than the available cores, for at least PARALLEL_MIN_TEXTS texts.
+
+        Returns:
+            Tuple[List[str], np.ndarray]: The flat list of tokens and the int64 offsets, one more than the texts.
+        """
+        tokens: List[str] = []
+        lengths: List[int] = []
+        for text_tokens in self._preprocess_iter(texts, n_process):
+            tokens.extend(map(sys.intern, text_tokens))
+            lengths.append(len(text_tokens))
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return tokens, offsets
+
+
+# Preprocessing instance of a worker process, built once by the pool initializer
+_worker_preprocessing: Optional[Preprocessing] = None
+
+
+def _init_worker(use_cache: bool, stopwords_flag: bool, stem_flag: bool, min_word_length: int) -> None:
+    """
+    Pool initializer: builds the preprocessing instance of the worker process, so that the stopwords and
+    the stemmer are not sent along with every batch of texts.
+
+    Args:
+        use_cache(bool): Flag to decide if using the cache or not.
+        stopwords_flag(bool): Flag to decide if performing stopwords removal or not.
+        stem_flag(bool): Flag to decide if performing stemming or not.
+        min_word_length(int): Minimum valid word length.
+    """
+    global _worker_preprocessing
+    _worker_preprocessing = Preprocessing(use_cache, stopwords_flag, stem_flag, min_word_length)
+
+
+def _process_text_worker(text: str) -> List[str]:
+    """
+    Helper function to perform the parallel vectorized preprocessing, in a worker process.
+
+    Args:
+        text(str): The text to pass to the single text preprocess method.
 
-        return all_preprocessed
+    Returns: A list of preprocessed tokens.
+    """
+    return _worker_preprocessing.single_text_preprocess(text)